@@ -15,3 +15,6 @@ class Config:
     OPENCODE_DB_PATH = Path.home() / ".local/share/opencode/opencode.db"
     SEARCH_DB_PATH = DATA_DIR / "search_index.db"
     MAIN_DB_PATH = DATA_DIR / "main.db"
+
+    # Re-check template files for changes on every render (for template development)
+    TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD") == "1"
@@ -8,33 +8,95 @@ This is the "parent" database: it owns all user-intent state including
 archived status (so a search index rebuild never loses that data).
 """
 
-from typing import Optional
-
-from sqlalchemy import Boolean, String, UniqueConstraint, create_engine, event, text
+import os
+import threading
+import time
+
+from typing import Iterable, Optional
+
+from sqlalchemy import (
+    Boolean,
+    Index,
+    String,
+    UniqueConstraint,
+    create_engine,
+    event,
+    text,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
 
 from app.config import Config
+from app.db_search import mirror_archived_state
+
+
+# Applied in a single executescript() per new connection
+_WRITER_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+"""
+_READER_PRAGMAS = """
+    PRAGMA query_only=ON;
+"""
+_COMMON_PRAGMAS = """
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+    PRAGMA busy_timeout=5000;
+    PRAGMA wal_autocheckpoint=1000;
+    PRAGMA foreign_keys=ON;
+"""
 
 
-def _make_engine():
-    engine = create_engine(f"sqlite:///{Config.MAIN_DB_PATH}")
+def _make_engine(readonly: bool = False, **kwargs):
+    engine = create_engine(
+        f"sqlite:///{Config.MAIN_DB_PATH}",
+        pool_pre_ping=False,
+        connect_args={"check_same_thread": False},
+        **kwargs,
+    )
+
+    pragmas = (_READER_PRAGMAS if readonly else _WRITER_PRAGMAS) + _COMMON_PRAGMAS
 
     @event.listens_for(engine, "connect")
     def set_pragma(dbapi_connection, _connection_record):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.close()
+        dbapi_connection.executescript(pragmas)
 
     return engine
 
 
-_engine = _make_engine()
+# Same split as the search DB: writes funnel through one pooled connection
+# (SQLite serialises writers anyway), while lookups use a pool of query_only
+# connections that WAL lets run alongside the writer.
+_writer_engine = _make_engine(pool_size=1, max_overflow=0)
+_reader_engine = _make_engine(
+    readonly=True, pool_size=max(4, os.cpu_count() or 1), max_overflow=4
+)
+
+
+# slug -> (upstream_session_id, cached_at) for get_conversation_by_slug()
+_SLUG_CACHE_TTL = 60.0
+_slug_cache: dict[str, tuple[str, float]] = {}
+_slug_cache_lock = threading.Lock()
 
+# Process-local copy of the archived ids for is_conversation_archived(); loaded
+# lazily from the DB and kept current by the archive helpers in this module.
+_archived_ids: Optional[set[str]] = None
+_archived_ids_lock = threading.Lock()
 
-def get_db_session() -> Session:
-    """Create a new SQLAlchemy session for the database."""
-    return Session(_engine)
+
+def get_db_writer_session() -> Session:
+    """Create a new SQLAlchemy session on the single-writer engine.
+
+    Rows stay loaded after commit (expire_on_commit=False), so helpers can hand
+    back the objects they just wrote without a reload round trip.
+    """
+    return Session(_writer_engine, expire_on_commit=False)
+
+
+def get_db_reader_session() -> Session:
+    """Create a new SQLAlchemy session on the read-only engine."""
+    return Session(_reader_engine)
 
 
 class Base(DeclarativeBase):
@@ -51,7 +113,12 @@ class Conversation(Base):
     """
 
     __tablename__ = "conversation"
-    __table_args__ = (UniqueConstraint("slug", name="uq_conversation_slug"),)
+    __table_args__ = (
+        UniqueConstraint("slug", name="uq_conversation_slug"),
+        # Covering index for get_archived_conversation_ids(): the archived filter
+        # and the projected id are both in the index, so no table lookups.
+        Index("ix_conversation_archived", "archived", "upstream_session_id"),
+    )
 
     # Primary key — mirrors the upstream session.id.
     upstream_session_id: Mapped[str] = mapped_column(String, primary_key=True)
@@ -68,7 +135,15 @@ class Conversation(Base):
 def init_db():
     """Create tables if they don't exist, and run any pending migrations."""
     Config.DATA_DIR.mkdir(parents=True, exist_ok=True)
-    Base.metadata.create_all(_engine)
+    Base.metadata.create_all(_writer_engine)
+
+    # create_all() skips tables that already exist, so indexes added after a
+    # database was first created have to be created explicitly.
+    for index in Conversation.__table__.indexes:
+        index.create(_writer_engine, checkfirst=True)
+
+    # Seed the archived id set so status checks never have to hit the DB
+    _archived_id_cache()
 
 
 # ---------------------------------------------------------------------------
@@ -78,7 +153,7 @@ def init_db():
 
 def get_conversation(upstream_session_id: str) -> Optional[Conversation]:
     """Return the Conversation row for the given upstream session ID, or None."""
-    with get_db_session() as db:
+    with get_db_reader_session() as db:
         return db.get(Conversation, upstream_session_id)
 
 
@@ -87,11 +162,29 @@ def ensure_conversation_exists(upstream_session_id: str) -> None:
 
     Safe to call on every sync — if the row already exists, nothing is changed
     (user-controlled fields like title, slug, and archived are never touched).
+    A single insert-or-ignore; no SELECT and no ORM object is involved.
     """
-    with get_db_session() as db:
-        if db.get(Conversation, upstream_session_id) is None:
-            db.add(Conversation(upstream_session_id=upstream_session_id))
-            db.commit()
+    bulk_ensure_conversations([upstream_session_id])
+
+
+def bulk_ensure_conversations(upstream_session_ids: Iterable[str]) -> None:
+    """Batched form of ensure_conversation_exists for many upstream session IDs.
+
+    Issues a single ``INSERT ... ON CONFLICT DO NOTHING`` (executemany) inside one
+    transaction, so a sync of N conversations costs one round trip and one commit
+    instead of N.  Existing rows are never touched.
+    """
+    rows = [
+        {"upstream_session_id": id_, "archived": False} for id_ in upstream_session_ids
+    ]
+    if not rows:
+        return
+
+    stmt = sqlite_insert(Conversation).on_conflict_do_nothing(
+        index_elements=["upstream_session_id"]
+    )
+    with get_db_writer_session() as db, db.begin():
+        db.execute(stmt, rows)
 
 
 def upsert_conversation(
@@ -107,19 +200,19 @@ def upsert_conversation(
 
     Returns the updated (or newly created) Conversation row.
     """
-    with get_db_session() as db:
+    with get_db_writer_session() as db:
         row = db.get(Conversation, upstream_session_id)
         if row is None:
-            row = Conversation(upstream_session_id=upstream_session_id)
+            row = Conversation(upstream_session_id=upstream_session_id, archived=False)
             db.add(row)
 
         if title is not ...:
             row.title = title
         if slug is not ...:
             row.slug = slug
+            _invalidate_slug_cache(upstream_session_id)
 
         db.commit()
-        db.refresh(row)
         return row
 
 
@@ -128,23 +221,57 @@ def delete_conversation(upstream_session_id: str) -> bool:
 
     Returns True if a row was deleted, False if none existed.
     """
-    with get_db_session() as db:
+    with get_db_writer_session() as db:
         row = db.get(Conversation, upstream_session_id)
         if row is None:
             return False
+        was_archived = row.archived
         db.delete(row)
         db.commit()
-        return True
+        _invalidate_slug_cache(upstream_session_id)
+    if was_archived:
+        _update_archived_id_cache(upstream_session_id, False)
+        mirror_archived_state([upstream_session_id], False, get_archived_conversation_ids)
+    return True
+
+
+def _invalidate_slug_cache(upstream_session_id: str) -> None:
+    """Drop any cached slug mappings pointing at the given conversation."""
+    with _slug_cache_lock:
+        for slug, (cached_id, _) in list(_slug_cache.items()):
+            if cached_id == upstream_session_id:
+                del _slug_cache[slug]
 
 
 def get_conversation_by_slug(slug: str) -> Optional[Conversation]:
-    """Resolve a slug to its Conversation row, or None if not found."""
+    """Resolve a slug to its Conversation row, or None if not found.
+
+    The slug -> id mapping is cached in-process for ``_SLUG_CACHE_TTL`` seconds,
+    turning the slug index lookup into a primary-key ``get``.  Cache hits are
+    checked against the row's current slug, so a stale entry can never resolve
+    to the wrong conversation.
+    """
     from sqlalchemy import select
 
-    with get_db_session() as db:
-        return db.execute(
-            select(Conversation).where(Conversation.slug == slug)
-        ).scalar_one_or_none()
+    now = time.monotonic()
+    with _slug_cache_lock:
+        cached = _slug_cache.get(slug)
+
+    with get_db_reader_session() as db:
+        if cached is not None and now - cached[1] < _SLUG_CACHE_TTL:
+            row = db.get(Conversation, cached[0])
+            if row is not None and row.slug == slug:
+                return row
+
+        upstream_session_id = db.scalar(
+            select(Conversation.upstream_session_id).where(Conversation.slug == slug)
+        )
+        if upstream_session_id is None:
+            return None
+
+        with _slug_cache_lock:
+            _slug_cache[slug] = (upstream_session_id, now)
+        return db.get(Conversation, upstream_session_id)
 
 
 # ---------------------------------------------------------------------------
@@ -155,33 +282,77 @@ def get_conversation_by_slug(slug: str) -> Optional[Conversation]:
 def set_conversation_archived(upstream_session_id: str, archived: bool) -> bool:
     """Set the archived status of a conversation.
 
-    Creates the Conversation row if it doesn't already exist.
+    Creates the Conversation row if it doesn't already exist, then mirrors the
+    new state onto the search index.
     Returns True always (operation always succeeds).
     """
-    with get_db_session() as db:
-        row = db.get(Conversation, upstream_session_id)
-        if row is None:
-            row = Conversation(upstream_session_id=upstream_session_id, archived=archived)
-            db.add(row)
+    set_conversations_archived([upstream_session_id], archived)
+    return True
+
+
+def set_conversations_archived(
+    upstream_session_ids: Iterable[str], archived: bool
+) -> None:
+    """Set the archived status of many conversations in one transaction.
+
+    Missing Conversation rows are created.  The change is mirrored onto the
+    search index with a single UPDATE as well.
+    """
+    ids = list(dict.fromkeys(upstream_session_ids))
+    if not ids:
+        return
+
+    stmt = sqlite_insert(Conversation).on_conflict_do_update(
+        index_elements=["upstream_session_id"], set_={"archived": archived}
+    )
+    with get_db_writer_session() as db, db.begin():
+        db.execute(
+            stmt, [{"upstream_session_id": id_, "archived": archived} for id_ in ids]
+        )
+    for id_ in ids:
+        _update_archived_id_cache(id_, archived)
+    mirror_archived_state(ids, archived, get_archived_conversation_ids)
+
+
+def _archived_id_cache() -> set[str]:
+    """Return the process-local archived id set, loading it on first use."""
+    global _archived_ids
+    with _archived_ids_lock:
+        if _archived_ids is None:
+            _archived_ids = get_archived_conversation_ids()
+        return _archived_ids
+
+
+def _update_archived_id_cache(upstream_session_id: str, archived: bool) -> None:
+    with _archived_ids_lock:
+        if _archived_ids is None:
+            return  # Not loaded yet; the first read picks up the DB state
+        if archived:
+            _archived_ids.add(upstream_session_id)
         else:
-            row.archived = archived
-        db.commit()
-        return True
+            _archived_ids.discard(upstream_session_id)
 
 
 def is_conversation_archived(upstream_session_id: str) -> bool:
-    """Check if a conversation is archived."""
-    with get_db_session() as db:
-        row = db.get(Conversation, upstream_session_id)
-        return row.archived if row else False
+    """Check if a conversation is archived (served from the in-process id set)."""
+    return upstream_session_id in _archived_id_cache()
+
+
+def get_archived_status(upstream_session_ids: Iterable[str]) -> dict[str, bool]:
+    """Check the archived status of several conversations at once."""
+    archived_ids = _archived_id_cache()
+    return {id_: id_ in archived_ids for id_ in upstream_session_ids}
 
 
 def get_archived_conversation_ids() -> set[str]:
     """Get all archived conversation IDs (as upstream session IDs)."""
     from sqlalchemy import select
 
-    with get_db_session() as db:
-        result = db.execute(
-            select(Conversation.upstream_session_id).where(Conversation.archived == True)  # noqa: E712
+    with get_db_reader_session() as db:
+        return set(
+            db.scalars(
+                select(Conversation.upstream_session_id).where(
+                    Conversation.archived.is_(True)
+                )
+            )
         )
-        return {row[0] for row in result.fetchall()}
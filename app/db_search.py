@@ -5,39 +5,98 @@ This module manages a local SQLite database with FTS5 indexing for fast
 full-text search of conversation contents. The mirror database is synced from
 the OpenCode source database on application startup.
 
-Archived state is NOT stored here — it lives in db.py (.db) so that a full
-index rebuild never loses user intent data.
+Archived state is owned by db.py (.db) so that a full index rebuild never
+loses user intent data.  conversation_index carries a mirrored copy of the
+flag purely so search and listing queries can filter in SQL; sync re-copies it
+from db.py on every run.
 """
 
 import re
-
-from typing import Optional
-
-from sqlalchemy import Integer, String, Text, create_engine, event, text
+import sys
+import threading
+
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import (
+    Boolean,
+    Index,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    event,
+    false,
+    text,
+    update,
+)
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
 
 from app.config import Config
 
 
-def _make_engine():
-    engine = create_engine(f"sqlite:///{Config.SEARCH_DB_PATH}")
+# Applied in a single executescript() per new connection
+_WRITER_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA wal_autocheckpoint=1000;
+"""
+_COMMON_PRAGMAS = """
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+    PRAGMA busy_timeout=5000;
+"""
+
+
+def _make_engine(url: str, readonly: bool = False, **kwargs):
+    engine = create_engine(url, **kwargs)
+
+    pragmas = _COMMON_PRAGMAS if readonly else _WRITER_PRAGMAS + _COMMON_PRAGMAS
 
     @event.listens_for(engine, "connect")
     def set_sqlite_pragma(dbapi_connection, connection_record):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.close()
-        dbapi_connection.create_function("REGEXP", 2, _sqlite_regexp)
+        dbapi_connection.executescript(pragmas)
+        dbapi_connection.create_function("REGEXP", 2, _sqlite_regexp, deterministic=True)
 
     return engine
 
 
-_engine = _make_engine()
+# SQLite serialises writers anyway, so sync funnels through a single pooled
+# connection instead of letting threadpool workers race for the write lock.
+# Searches and listings use a separate pool of read-only connections, which
+# WAL mode lets run concurrently with the writer.
+_writer_engine = _make_engine(
+    f"sqlite:///{Config.SEARCH_DB_PATH}",
+    pool_size=1,
+    max_overflow=0,
+    connect_args={"check_same_thread": False},
+)
+_reader_engine = _make_engine(
+    f"sqlite:///file:{Config.SEARCH_DB_PATH}?mode=ro&uri=true",
+    readonly=True,
+    pool_size=8,
+    max_overflow=8,
+    connect_args={"check_same_thread": False},
+)
+
+
+def get_search_writer_session() -> Session:
+    """Create a new SQLAlchemy session on the single-writer search engine."""
+    return Session(_writer_engine)
+
 
+def get_search_reader_session() -> Session:
+    """Create a new SQLAlchemy session on the read-only search engine."""
+    return Session(_reader_engine)
 
-def get_search_session() -> Session:
-    """Create a new SQLAlchemy session for the search database."""
-    return Session(_engine)
+
+def dispose_search_engines() -> None:
+    """Close all pooled search DB connections (e.g. before deleting the file)."""
+    _writer_engine.dispose()
+    _reader_engine.dispose()
 
 
 class SearchBase(DeclarativeBase):
@@ -56,6 +115,27 @@ class SearchConversationIndex(SearchBase):
     title: Mapped[Optional[str]] = mapped_column(String)
     time_updated: Mapped[Optional[int]] = mapped_column(Integer)
 
+    # Mirror of Conversation.archived in db.py (the authoritative copy).
+    archived: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=text("0"), nullable=False
+    )
+
+
+# Serves the "newest non-archived conversations" filter + sort
+Index(
+    "ix_conv_idx_updated_archived",
+    SearchConversationIndex.time_updated.desc(),
+    SearchConversationIndex.archived,
+)
+
+# Partial index over the unarchived rows only: list_directories() reads its
+# sorted, distinct directories straight from it
+Index(
+    "ix_conv_idx_active_directory",
+    SearchConversationIndex.directory,
+    sqlite_where=SearchConversationIndex.archived == false(),
+)
+
 
 class SearchPartIndex(SearchBase):
     """Index of parts with extracted text for FTS."""
@@ -79,30 +159,181 @@ class SearchSyncMetadata(SearchBase):
     value: Mapped[str] = mapped_column(String)
 
 
+@lru_cache(maxsize=256)
+def compile_regex(pattern: str) -> re.Pattern:
+    """Compile a case-insensitive regex, cached so per-row REGEXP calls don't recompile."""
+    return re.compile(pattern, re.IGNORECASE)
+
+
+# Keeps each IN (...) list well below SQLite's bound-parameter limit
+ARCHIVED_MIRROR_BATCH_SIZE = 500
+
+# Held by sync for its whole run and by each archive mirror for its UPDATE.
+# Mirrors only ever *try* it, so an archive click is never queued behind a long
+# bulk load on the single-connection writer pool; a skipped change is flagged
+# instead and whoever holds the writer replays archived state from db.py
+# before letting go.
+_writer_lock = threading.Lock()
+_mirror_state_lock = threading.Lock()
+_archived_mirror_stale = False
+
+
+def sync_archived_state(search_db, archived_ids: Iterable[str]):
+    """Reconcile conversation_index.archived with the archived ids from db.py.
+
+    Runs inside the caller's transaction, so readers never see the mirror
+    half-updated.
+    """
+    archived_ids = list(archived_ids)
+    search_db.execute(
+        update(SearchConversationIndex)
+        .where(SearchConversationIndex.archived.is_(True))
+        .values(archived=False)
+    )
+    for i in range(0, len(archived_ids), ARCHIVED_MIRROR_BATCH_SIZE):
+        search_db.execute(
+            update(SearchConversationIndex)
+            .where(
+                SearchConversationIndex.id.in_(
+                    archived_ids[i : i + ARCHIVED_MIRROR_BATCH_SIZE]
+                )
+            )
+            .values(archived=True)
+        )
+
+
+@contextmanager
+def exclusive_search_writer(archived_ids: Callable[[], Iterable[str]]):
+    """Hold the search writer for a sync, replaying skipped archive mirrors after.
+
+    ``archived_ids`` returns the authoritative archived ids from db.py; they are
+    re-copied (still under the lock) for as long as mirror_archived_state calls
+    were skipped.
+    """
+    _writer_lock.acquire()
+    try:
+        yield
+    finally:
+        _release_search_writer(archived_ids)
+
+
+def _release_search_writer(archived_ids: Callable[[], Iterable[str]]) -> None:
+    global _archived_mirror_stale
+    while True:
+        with _mirror_state_lock:
+            if not _archived_mirror_stale:
+                _writer_lock.release()
+                return
+            _archived_mirror_stale = False
+        try:
+            with get_search_writer_session() as db:
+                sync_archived_state(db, archived_ids())
+                db.commit()
+        except BaseException:
+            with _mirror_state_lock:
+                _archived_mirror_stale = True
+            _writer_lock.release()
+            raise
+
+
+def mirror_archived_state(
+    upstream_session_ids: Iterable[str],
+    archived: bool,
+    archived_ids: Callable[[], Iterable[str]],
+) -> None:
+    """Copy an archived-state change from db.py onto the search index.
+
+    Best effort and non-blocking: while a sync or another mirror holds the
+    writer the change is only flagged, and the holder re-copies every id from
+    ``archived_ids`` (db.py's authoritative set) before releasing it.  Other
+    failures (e.g. the index isn't built yet) are logged, since the next sync
+    reconciles the mirror anyway.
+    """
+    global _archived_mirror_stale
+    ids = list(upstream_session_ids)
+    if not ids:
+        return
+    with _mirror_state_lock:
+        if not _writer_lock.acquire(blocking=False):
+            _archived_mirror_stale = True
+            return
+    try:
+        with get_search_writer_session() as db:
+            for i in range(0, len(ids), ARCHIVED_MIRROR_BATCH_SIZE):
+                db.execute(
+                    update(SearchConversationIndex)
+                    .where(
+                        SearchConversationIndex.id.in_(
+                            ids[i : i + ARCHIVED_MIRROR_BATCH_SIZE]
+                        )
+                    )
+                    .values(archived=archived)
+                )
+            db.commit()
+    except SQLAlchemyError as e:
+        print(f"Warning: Failed to mirror archived state: {e}", file=sys.stderr)
+    finally:
+        try:
+            _release_search_writer(archived_ids)
+        except SQLAlchemyError as e:
+            print(f"Warning: Failed to mirror archived state: {e}", file=sys.stderr)
+
+
 def _sqlite_regexp(pattern: str, string: str) -> bool:
     """SQLite REGEXP function implementation using Python's re module."""
     if string is None:
         return False
     try:
-        return re.search(pattern, string, re.IGNORECASE) is not None
+        return compile_regex(pattern).search(string) is not None
     except re.error:
         # Invalid regex pattern
         return False
 
 
+# Bump whenever the part_fts definition changes; init_search_db rebuilds the
+# FTS table when the stored version differs.
+FTS_SCHEMA_VERSION = "2"  # 2: trigram tokenizer (was porter unicode61)
+
+
 def init_search_db():
     """Initialize the search database with tables and FTS5 virtual table."""
-    engine = _engine
+    engine = _writer_engine
 
     # Create regular tables
     SearchBase.metadata.create_all(engine)
 
+    # Migrate conversation_index tables created before the archived mirror existed
+    with engine.begin() as conn:
+        columns = {
+            row[1] for row in conn.execute(text("PRAGMA table_info(conversation_index)"))
+        }
+        if "archived" not in columns:
+            conn.execute(
+                text(
+                    "ALTER TABLE conversation_index "
+                    "ADD COLUMN archived BOOLEAN NOT NULL DEFAULT 0"
+                )
+            )
+        for index in SearchConversationIndex.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
     # Create FTS5 virtual table for full-text search
     with engine.connect() as conn:
-        result = conn.execute(
+        exists = conn.execute(
             text("SELECT name FROM sqlite_master WHERE type='table' AND name='part_fts'")
+        ).fetchone()
+        version = conn.scalar(
+            text("SELECT value FROM sync_metadata WHERE key = 'fts_schema_version'")
         )
-        if not result.fetchone():
+        if exists and version != FTS_SCHEMA_VERSION:
+            # Built with an older definition: replace it and re-index part_index
+            drop_fts_triggers(conn)
+            conn.execute(text("DROP TABLE part_fts"))
+            exists = None
+
+        if not exists:
+            # Trigram tokens make every query a case-insensitive substring match,
+            # so identifiers like "get_search_" and CJK text are findable too.
             conn.execute(
                 text(
                     """
@@ -110,46 +341,110 @@ def init_search_db():
                         content,
                         content='part_index',
                         content_rowid='rowid',
-                        tokenize='porter unicode61'
+                        tokenize='trigram'
                     )
                     """
                 )
             )
-
-            # Create triggers to keep FTS in sync with part_index
+            rebuild_fts_index(conn)
             conn.execute(
                 text(
-                    """
-                    CREATE TRIGGER part_index_ai AFTER INSERT ON part_index BEGIN
-                        INSERT INTO part_fts(rowid, content)
-                        VALUES (NEW.rowid, NEW.content);
-                    END
-                    """
-                )
+                    "INSERT INTO sync_metadata (key, value) "
+                    "VALUES ('fts_schema_version', :version) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+                ),
+                {"version": FTS_SCHEMA_VERSION},
             )
 
-            conn.execute(
-                text(
-                    """
-                    CREATE TRIGGER part_index_ad AFTER DELETE ON part_index BEGIN
-                        INSERT INTO part_fts(part_fts, rowid, content)
-                        VALUES ('delete', OLD.rowid, OLD.content);
-                    END
-                    """
-                )
-            )
+        # Always (re)create the triggers: a full sync drops them while bulk loading,
+        # and this restores them if that sync died before putting them back.
+        create_fts_triggers(conn)
+        conn.commit()
+
+
+def create_fts_triggers(conn):
+    """Create the triggers that keep part_fts in sync with part_index row by row."""
+    conn.execute(
+        text(
+            """
+            CREATE TRIGGER IF NOT EXISTS part_index_ai AFTER INSERT ON part_index BEGIN
+                INSERT INTO part_fts(rowid, content)
+                VALUES (NEW.rowid, NEW.content);
+            END
+            """
+        )
+    )
+
+    conn.execute(
+        text(
+            """
+            CREATE TRIGGER IF NOT EXISTS part_index_ad AFTER DELETE ON part_index BEGIN
+                INSERT INTO part_fts(part_fts, rowid, content)
+                VALUES ('delete', OLD.rowid, OLD.content);
+            END
+            """
+        )
+    )
+
+    conn.execute(
+        text(
+            """
+            CREATE TRIGGER IF NOT EXISTS part_index_au AFTER UPDATE ON part_index BEGIN
+                INSERT INTO part_fts(part_fts, rowid, content)
+                VALUES ('delete', OLD.rowid, OLD.content);
+                INSERT INTO part_fts(rowid, content)
+                VALUES (NEW.rowid, NEW.content);
+            END
+            """
+        )
+    )
+
+
+def drop_fts_triggers(conn):
+    """Drop the part_index -> part_fts triggers (for bulk loads)."""
+    for trigger in ("part_index_ai", "part_index_ad", "part_index_au"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+
+
+def rebuild_fts_index(conn):
+    """Rebuild part_fts from the current contents of part_index in one pass."""
+    conn.execute(text("INSERT INTO part_fts(part_fts) VALUES ('rebuild')"))
 
-            conn.execute(
-                text(
-                    """
-                    CREATE TRIGGER part_index_au AFTER UPDATE ON part_index BEGIN
-                        INSERT INTO part_fts(part_fts, rowid, content)
-                        VALUES ('delete', OLD.rowid, OLD.content);
-                        INSERT INTO part_fts(rowid, content)
-                        VALUES (NEW.rowid, NEW.content);
-                    END
-                    """
-                )
-            )
 
-            conn.commit()
+@contextmanager
+def bulk_load_durability(conn, enabled: bool = True):
+    """Skip fsyncs on ``conn`` for the duration of a bulk (re)load.
+
+    The search index is derived data that a full sync can always rebuild, so
+    the load trades crash safety for speed; NORMAL is restored afterwards so
+    the pooled connection doesn't keep the relaxed setting. SQLite only allows
+    the change outside a transaction, so enter this before the first write and
+    commit before leaving it (a failed load is rolled back first). Relies on
+    the single-connection writer pool handing the same connection back after
+    that commit.
+    """
+    if not enabled:
+        yield
+        return
+    conn.execute(text("PRAGMA synchronous=OFF"))
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(text("PRAGMA synchronous=NORMAL"))
+
+
+def optimize_fts_index(conn):
+    """Merge part_fts's b-tree segments into one for faster queries."""
+    conn.execute(text("INSERT INTO part_fts(part_fts) VALUES ('optimize')"))
+
+
+def refresh_planner_stats(conn, full: bool = False):
+    """Update the query planner's table statistics after the index changed.
+
+    A full ANALYZE after a full rebuild; otherwise PRAGMA optimize, which only
+    re-analyzes tables whose contents have shifted enough to matter.
+    """
+    conn.execute(text("ANALYZE" if full else "PRAGMA optimize"))
@@ -1,14 +1,68 @@
-import json
-
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey, Integer, String, Text, create_engine
+from pydantic_core import from_json
+from sqlalchemy import ForeignKey, Integer, String, Text, case, create_engine, event, func
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
 
 from app.config import Config
 
 
-_engine = create_engine(f"sqlite:///{Config.OPENCODE_DB_PATH}?mode=ro")
+# Applied in a single executescript() per new connection.  Sync scans the whole
+# upstream DB, so map up to 1GB of it: page reads then come straight from the OS
+# page cache instead of repeated pread() calls.
+_PRAGMAS = """
+    PRAGMA query_only=1;
+    PRAGMA mmap_size=1073741824;
+    PRAGMA cache_size=-65536;
+    PRAGMA temp_store=MEMORY;
+"""
+
+
+def _make_engine():
+    engine = create_engine(
+        f"sqlite:///{Config.OPENCODE_DB_PATH}?mode=ro",
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=False,
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_pragma(dbapi_connection, _connection_record):
+        dbapi_connection.executescript(_PRAGMAS)
+
+    return engine
+
+
+_engine = _make_engine()
+
+
+def _load_json_data(instance) -> dict:
+    """Parse ``instance.data`` as JSON, memoized on the instance.
+
+    Every property below reads through here, so rendering a message or part
+    costs one parse instead of one per attribute.  The cache remembers the raw
+    string it was built from, so a changed ``data`` value is re-parsed rather
+    than served stale.
+    """
+    cached = instance.__dict__.get("_json_data_cache")
+    if cached is not None and cached[0] is instance.data:
+        return cached[1]
+    try:
+        parsed = from_json(instance.data)
+    except (ValueError, TypeError):
+        parsed = {}
+    instance.__dict__["_json_data_cache"] = (instance.data, parsed)
+    return parsed
+
+
+def _json_field(column, path: str):
+    """SQL expression for one field of a JSON ``data`` column.
+
+    Mirrors _load_json_data's leniency: a malformed document yields NULL rather
+    than aborting the whole query.
+    """
+    return case((func.json_valid(column), func.json_extract(column, path)))
 
 
 def get_upstream_session() -> Session:
@@ -66,15 +120,20 @@ class UpstreamMessage(UpstreamBase):
 
     @property
     def _json_data(self) -> dict:
-        try:
-            return json.loads(self.data)
-        except (ValueError, TypeError):
-            return {}
+        return _load_json_data(self)
 
-    @property
+    # The hot fields below are hybrids so queries can filter and project them in
+    # SQL (e.g. sync) without loading and parsing whole rows in Python.
+
+    @hybrid_property
     def role(self) -> str:
         return self._json_data.get("role", "unknown")
 
+    @role.inplace.expression
+    @classmethod
+    def _role_expression(cls):
+        return func.coalesce(_json_field(cls.data, "$.role"), "unknown")
+
     @property
     def agent(self) -> Optional[str]:
         return self._json_data.get("agent")
@@ -83,10 +142,28 @@ class UpstreamMessage(UpstreamBase):
     def model(self) -> Optional[dict]:
         return self._json_data.get("model")
 
-    @property
+    @hybrid_property
     def modelID(self) -> Optional[str]:
         return self._json_data.get("modelID")
 
+    @modelID.inplace.expression
+    @classmethod
+    def _modelID_expression(cls):
+        return _json_field(cls.data, "$.modelID")
+
+    @hybrid_property
+    def model_name(self) -> Optional[str]:
+        """The model ID, from the nested model object or the legacy top-level field."""
+        model = self.model
+        return (isinstance(model, dict) and model.get("modelID")) or self.modelID
+
+    @model_name.inplace.expression
+    @classmethod
+    def _model_name_expression(cls):
+        return func.coalesce(
+            _json_field(cls.data, "$.model.modelID"), _json_field(cls.data, "$.modelID")
+        )
+
     @property
     def summary(self) -> Optional[dict]:
         summary_value = self._json_data.get("summary")
@@ -115,23 +192,35 @@ class UpstreamPart(UpstreamBase):
 
     @property
     def _json_data(self) -> dict:
-        try:
-            return json.loads(self.data)
-        except (ValueError, TypeError):
-            return {}
+        return _load_json_data(self)
 
-    @property
+    @hybrid_property
     def type(self) -> str:
         return self._json_data.get("type", "unknown")
 
-    @property
+    @type.inplace.expression
+    @classmethod
+    def _type_expression(cls):
+        return func.coalesce(_json_field(cls.data, "$.type"), "unknown")
+
+    @hybrid_property
     def text(self) -> Optional[str]:
         return self._json_data.get("text")
 
-    @property
+    @text.inplace.expression
+    @classmethod
+    def _text_expression(cls):
+        return _json_field(cls.data, "$.text")
+
+    @hybrid_property
     def tool(self) -> Optional[str]:
         return self._json_data.get("tool")
 
+    @tool.inplace.expression
+    @classmethod
+    def _tool_expression(cls):
+        return _json_field(cls.data, "$.tool")
+
     @property
     def callID(self) -> Optional[str]:
         return self._json_data.get("callID")
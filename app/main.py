@@ -1,41 +1,150 @@
+import asyncio
+import hashlib
+import sys
+
 from contextlib import asynccontextmanager
-from typing import Optional
+from functools import lru_cache
+from typing import Any, List, Optional
 
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader
+from pydantic_core import to_json
+from starlette.datastructures import QueryParams
 
 from app.config import Config
 from app.db import (
+    get_archived_status,
     init_db,
     is_conversation_archived,
     set_conversation_archived,
+    set_conversations_archived,
 )
+from app.models import ArchiveRequest
 from app.services import (
     format_timestamp,
+    invalidate_directories_cache,
     list_archived_conversations,
     list_conversations,
     list_directories,
     load_conversation_export,
     search_conversations,
+    shorten_directory,
 )
 from app.sync import sync_search_index
 
 
+# How long shutdown waits for an in-flight startup sync before giving up on it
+SYNC_SHUTDOWN_TIMEOUT = 30.0
+
+PAGE_TEMPLATES = ("dashboard.html", "archived.html", "conversation.html")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Application lifespan: initialise databases and sync search index on startup."""
+    """Application lifespan: initialise databases and sync search index on startup.
+
+    The sync runs as a background task so the server starts serving immediately;
+    until it finishes, pages and search reflect the previous index snapshot.
+    """
+    app.state.sync_lock = asyncio.Lock()
     init_db()
-    sync_search_index()
-    yield
+    for template_name in PAGE_TEMPLATES:
+        templates.get_template(template_name)  # compile now, not on first request
+    app.state.sync_task = asyncio.create_task(_run_sync(app))
+    try:
+        yield
+    finally:
+        try:
+            await asyncio.wait_for(app.state.sync_task, timeout=SYNC_SHUTDOWN_TIMEOUT)
+        except Exception as e:
+            print(f"Startup sync did not complete cleanly: {e!r}", file=sys.stderr)
+
 
+async def _run_sync(app: FastAPI):
+    """Run an incremental search index sync in the threadpool, one at a time.
 
-app = FastAPI(title=Config.TITLE, lifespan=lifespan)
+    Syncs share the single search-index writer connection, so a manual sync
+    requested while the startup sync is running waits for it instead of racing
+    it for the connection.
+    """
+    async with app.state.sync_lock:
+        await run_in_threadpool(sync_search_index)
 
-static_assets = StaticFiles(directory=str(Config.STATIC_ASSETS_DIR))
-templates = Jinja2Templates(directory=str(Config.TEMPLATES_DIR))
+
+class PydanticJSONResponse(JSONResponse):
+    """JSON response rendered by pydantic-core's Rust serializer.
+
+    Accepts Pydantic models (and lists/dicts of them) directly, so API handlers
+    don't need a model_dump() pass before the stdlib json encoder runs.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+app = FastAPI(
+    title=Config.TITLE,
+    lifespan=lifespan,
+    default_response_class=PydanticJSONResponse,
+)
+
+# Search results and the conversation page (which inlines the full export JSON)
+# can run to megabytes; JSON/HTML typically compresses 5-10x.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers keep fingerprinted assets indefinitely.
+
+    URLs built by static_url() carry a ``?v=<content hash>`` query, so a changed
+    file gets a new URL; anything requested without one must be revalidated.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if "v" in QueryParams(scope["query_string"]):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+@lru_cache(maxsize=256)
+def _asset_fingerprint(path: str, mtime_ns: int) -> str:
+    content = (Config.STATIC_ASSETS_DIR / path).read_bytes()
+    return hashlib.blake2b(content, digest_size=8).hexdigest()
+
+
+def static_url(path: str) -> str:
+    """URL for a static asset, fingerprinted with a hash of its current contents."""
+    try:
+        mtime_ns = (Config.STATIC_ASSETS_DIR / path).stat().st_mtime_ns
+    except OSError:
+        return f"/static/{path}"
+    return f"/static/{path}?v={_asset_fingerprint(path, mtime_ns)}"
+
+
+# The directory ships with the app, so skip StaticFiles' isdir() check at import
+static_assets = CachedStaticFiles(
+    directory=str(Config.STATIC_ASSETS_DIR), check_dir=False
+)
+# Compiled templates are cached without limit, and by default never re-stat'ed
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader(Config.TEMPLATES_DIR),
+        autoescape=True,
+        auto_reload=Config.TEMPLATES_AUTO_RELOAD,
+        cache_size=-1,
+    )
+)
+templates.env.filters["format_ts"] = format_timestamp
+templates.env.filters["short_dir"] = shorten_directory
+templates.env.globals["static_url"] = static_url
 
 # Mount static files
 app.mount("/static", static_assets, name="static")
@@ -43,27 +152,15 @@ app.mount("/static", static_assets, name="static")
 
 @app.get("/", response_class=HTMLResponse)
 async def dashboard(request: Request, all: bool = False):
-    conversations = list_conversations(show_all=all)
-
-    display_conversations = []
-    for s in conversations:
-        s_dict = s.model_dump()
-
-        # Shorten directory
-        directory = s.directory or ""
-        dir_short = directory
-        if len(directory) > 40:
-            dir_short = "..." + directory[-37:]
-
-        s_dict["updated_formatted"] = format_timestamp(s.time_updated)
-        s_dict["directory_short"] = dir_short
-        display_conversations.append(s_dict)
+    conversations = await run_in_threadpool(list_conversations, show_all=all)
 
-    return templates.TemplateResponse(
+    # TemplateResponse renders eagerly, so build it off the event loop too
+    return await run_in_threadpool(
+        templates.TemplateResponse,
         request,
         "dashboard.html",
         {
-            "conversations": display_conversations,
+            "conversations": conversations,
             "show_all": all,
         },
     )
@@ -77,31 +174,53 @@ async def api_search(
     regex: bool = Query(False, description="Use regex search instead of plaintext"),
 ):
     """Search conversations using full-text search or regex."""
-    results = search_conversations(query=q, directory=directory, limit=limit, regex=regex)
-    return JSONResponse(
-        content=[r.model_dump() for r in results],
+    results = await run_in_threadpool(
+        search_conversations, query=q, directory=directory, limit=limit, regex=regex
     )
+    return PydanticJSONResponse(content=results)
 
 
 @app.get("/api/directories")
-async def api_directories():
-    """Get list of unique directories for filtering."""
-    directories = list_directories()
-    return JSONResponse(content=directories)
+async def api_directories(request: Request):
+    """Get list of unique directories for filtering.
+
+    Sends an ETag so a client whose list is unchanged gets an empty 304.
+    """
+    directories = await run_in_threadpool(list_directories)
+    payload = to_json(directories)
+    etag = f'"{hashlib.blake2b(payload, digest_size=8).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(payload, media_type="application/json", headers=headers)
 
 
 @app.post("/api/sync")
-async def api_sync():
+async def api_sync(request: Request):
     """Trigger an incremental sync of the search index from the source database."""
-    await run_in_threadpool(sync_search_index)
-    return JSONResponse(content={"status": "ok"})
+    await _run_sync(request.app)
+    return PydanticJSONResponse(content={"status": "ok"})
+
+
+@app.get("/api/sync/status")
+async def api_sync_status(request: Request):
+    """Report the state of the background startup sync."""
+    task: asyncio.Task = request.app.state.sync_task
+    if not task.done():
+        status = "running"
+    elif task.cancelled() or task.exception() is not None:
+        status = "failed"
+    else:
+        status = "ok"
+    return PydanticJSONResponse(content={"status": status})
 
 
 @app.post("/api/conversation/{conversation_id}/archive")
 async def api_archive_conversation(conversation_id: str):
     """Archive a conversation (soft delete)."""
-    set_conversation_archived(conversation_id, archived=True)
-    return JSONResponse(
+    await run_in_threadpool(set_conversation_archived, conversation_id, archived=True)
+    invalidate_directories_cache()
+    return PydanticJSONResponse(
         content={"status": "archived", "conversation_id": conversation_id}
     )
 
@@ -109,60 +228,77 @@ async def api_archive_conversation(conversation_id: str):
 @app.post("/api/conversation/{conversation_id}/unarchive")
 async def api_unarchive_conversation(conversation_id: str):
     """Unarchive a conversation."""
-    set_conversation_archived(conversation_id, archived=False)
-    return JSONResponse(
+    await run_in_threadpool(set_conversation_archived, conversation_id, archived=False)
+    invalidate_directories_cache()
+    return PydanticJSONResponse(
         content={"status": "unarchived", "conversation_id": conversation_id}
     )
 
 
+@app.post("/api/conversations/archive")
+async def api_archive_conversations(body: ArchiveRequest):
+    """Archive (or unarchive) many conversations in one transaction."""
+    await run_in_threadpool(set_conversations_archived, body.ids, body.archived)
+    invalidate_directories_cache()
+    return PydanticJSONResponse(
+        content={
+            "status": "archived" if body.archived else "unarchived",
+            "conversation_ids": body.ids,
+        }
+    )
+
+
 @app.get("/api/conversation/{conversation_id}/archived")
 async def api_conversation_archived_status(conversation_id: str):
     """Check if a conversation is archived."""
     archived = is_conversation_archived(conversation_id)
-    return JSONResponse(
+    return PydanticJSONResponse(
         content={"conversation_id": conversation_id, "archived": archived}
     )
 
 
+@app.get("/api/archived/bulk")
+async def api_archived_status_bulk(
+    id: List[str] = Query(..., description="Conversation IDs to check"),
+):
+    """Check the archived status of several conversations in one request."""
+    return PydanticJSONResponse(content=get_archived_status(id))
+
+
 @app.get("/archived", response_class=HTMLResponse)
 async def archived_conversations(request: Request):
     """View archived conversations."""
-    conversations = list_archived_conversations()
-
-    display_conversations = []
-    for s in conversations:
-        s_dict = s.model_dump()
-
-        # Shorten directory
-        directory = s.directory or ""
-        dir_short = directory
-        if len(directory) > 40:
-            dir_short = "..." + directory[-37:]
+    conversations = await run_in_threadpool(list_archived_conversations)
 
-        s_dict["updated_formatted"] = format_timestamp(s.time_updated)
-        s_dict["directory_short"] = dir_short
-        display_conversations.append(s_dict)
-
-    return templates.TemplateResponse(
+    return await run_in_threadpool(
+        templates.TemplateResponse,
         request,
         "archived.html",
         {
-            "conversations": display_conversations,
+            "conversations": conversations,
         },
     )
 
 
+def _script_safe_json(content: Any) -> str:
+    """Serialize content as JSON that can be inlined in a <script> tag."""
+    # Escape forward slashes to prevent </script> attacks/breakage (done on the
+    # encoder's bytes output so the payload is only copied once more, on decode)
+    # by_alias=False keeps field names (project_id, ...) as model_dump_json() does
+    return to_json(content, by_alias=False).replace(b"</", b"<\\/").decode()
+
+
 @app.get("/conversation/{conversation_id}", response_class=HTMLResponse)
 async def view_conversation(request: Request, conversation_id: str):
-    conversation_data = load_conversation_export(conversation_id)
+    conversation_data = await run_in_threadpool(load_conversation_export, conversation_id)
     if conversation_data is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     # We need to pass the JSON as a string to the template for injection
-    # Escape forward slashes to prevent </script> attacks/breakage
-    conversation_json = conversation_data.model_dump_json().replace("</", "<\\/")
+    conversation_json = await run_in_threadpool(_script_safe_json, conversation_data)
 
-    return templates.TemplateResponse(
+    return await run_in_threadpool(
+        templates.TemplateResponse,
         request,
         "conversation.html",
         {
@@ -173,6 +309,20 @@ async def view_conversation(request: Request, conversation_id: str):
 
 
 if __name__ == "__main__":
+    import argparse
+
     import uvicorn
 
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
+    parser = argparse.ArgumentParser(description="Run the session viewer server.")
+    parser.add_argument("--reload", action="store_true", help="Reload on code changes")
+    args = parser.parse_args()
+
+    # uvloop + httptools (from uvicorn[standard]) instead of asyncio + h11
+    uvicorn.run(
+        "app.main:app",
+        host="127.0.0.1",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        reload=args.reload,
+    )
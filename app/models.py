@@ -108,6 +108,16 @@ class ConversationExport(BaseModel):
     messages: List[Message]
 
 
+# --- Request Models ---
+
+
+class ArchiveRequest(BaseModel):
+    """Batch archive/unarchive request."""
+
+    ids: List[str] = Field(min_length=1, max_length=1000)
+    archived: bool = True
+
+
 # --- Search Models ---
 
 
@@ -1,20 +1,26 @@
-import json
 import re
 import sys
+import time
 
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import select, text
+from pydantic import TypeAdapter
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.orm import Session, aliased, selectinload
 
 from app.config import Config
 from app.db import (
     Conversation,
-    get_archived_conversation_ids,
     get_conversation,
-    get_db_session,
+    get_db_reader_session,
+)
+from app.db_search import (
+    SearchConversationIndex,
+    SearchPartIndex,
+    compile_regex,
+    get_search_reader_session,
 )
-from app.db_search import SearchConversationIndex, SearchPartIndex, get_search_session
 from app.db_upstream import UpstreamMessage, UpstreamSession, get_upstream_session
 from app.models import (
     ConversationExport,
@@ -41,49 +47,120 @@ def _apply_extensions(
     return summary
 
 
-def list_conversations_from_db() -> List[ConversationSummary]:
-    """List all conversations, starting from Conversation rows in db.py.
+# Validates a whole batch of upstream session rows in a single call
+_SUMMARY_LIST_ADAPTER = TypeAdapter(List[ConversationSummary])
+
+# Upstream rows are fetched with IN lists of at most this many ids, well under
+# SQLite's bound-parameter limit
+UPSTREAM_FETCH_BATCH_SIZE = 500
+
+
+def _model_names_by_session(
+    upstream_db: Session, session_ids: List[str]
+) -> dict[str, str]:
+    """Map upstream session ids to the model of their first message naming one.
+
+    One query for the whole batch: a correlated subquery picks each session's
+    first candidate message (cheap LIKE, LIMIT 1), and only those winning rows
+    have their JSON extracted in SQL.
+    """
+    candidate = aliased(UpstreamMessage)
+    first_message_id = (
+        select(candidate.id)
+        .where(candidate.session_id == UpstreamSession.id)
+        .where(candidate.data.like("%modelID%"))
+        .order_by(candidate.time_created)
+        .limit(1)
+        .correlate(UpstreamSession)
+        .scalar_subquery()
+    )
+    rows = upstream_db.execute(
+        select(UpstreamSession.id, UpstreamMessage.model_name)
+        .join(UpstreamMessage, UpstreamMessage.id == first_message_id)
+        .where(UpstreamSession.id.in_(session_ids))
+        .where(UpstreamMessage.model_name.is_not(None))
+    )
+    return dict(rows.tuples().all())
+
+
+def _is_subagent_conversation(summary: ConversationSummary) -> bool:
+    """Whether a conversation is a subagent's (hidden unless show_all)."""
+    return summary.parent_id is not None or "subagent" in (summary.title or "").lower()
+
+
+def list_conversations_from_db(
+    archived: Optional[bool] = None,
+    top_level_only: bool = False,
+) -> List[ConversationSummary]:
+    """List conversations, most recently updated first, starting from db.py.
 
     For each Conversation row, fetches the corresponding upstream data and
     overlays any user-defined extension fields.  Upstream is treated as a
     viewonly join keyed on upstream_session_id.
+
+    Args:
+        archived: Only list archived (True) or unarchived (False) conversations;
+            None lists all of them.
+        top_level_only: Skip subagent conversations (see
+            _is_subagent_conversation), filtering upstream rows in SQL.
     """
     results = []
     try:
-        with get_db_session() as db:
-            conversations = db.scalars(select(Conversation)).all()
+        stmt = select(Conversation)
+        if archived is not None:
+            stmt = stmt.where(Conversation.archived.is_(archived))
+        with get_db_reader_session() as db:
+            conversations = db.scalars(stmt).all()
+        if not conversations:
+            return results
 
         with get_upstream_session() as upstream_db:
-            for conv in conversations:
-                upstream = upstream_db.get(UpstreamSession, conv.upstream_session_id)
-                if upstream is None:
-                    # Upstream row gone (deleted from source); skip.
-                    continue
-
-                # Fetch model name from the first message that carries one
-                model_name = "Unknown"
-                msg = upstream_db.scalars(
-                    select(UpstreamMessage)
-                    .where(UpstreamMessage.session_id == conv.upstream_session_id)
-                    .where(UpstreamMessage.data.like("%modelID%"))
-                    .limit(1)
-                ).first()
-
-                if msg:
-                    try:
-                        msg_data = json.loads(msg.data)
-                        model_name = (
-                            msg_data.get("model", {}).get("modelID")
-                            or msg_data.get("modelID")
-                            or "Unknown"
+            for i in range(0, len(conversations), UPSTREAM_FETCH_BATCH_SIZE):
+                batch = conversations[i : i + UPSTREAM_FETCH_BATCH_SIZE]
+                conversations_by_id = {conv.upstream_session_id: conv for conv in batch}
+                ids = list(conversations_by_id)
+                # Plain column mappings rather than ORM instances: no identity-map
+                # bookkeeping, and the whole batch validates in one adapter call.
+                # Conversations whose upstream row was deleted simply don't appear.
+                stmt = (
+                    select(*UpstreamSession.__table__.c)
+                    .where(UpstreamSession.id.in_(ids))
+                    .order_by(UpstreamSession.time_updated.desc().nulls_last())
+                )
+                if top_level_only:
+                    # The title test only holds for upstream titles, so renamed
+                    # conversations pass through to the check after the overlay
+                    renamed = [
+                        id_
+                        for id_, c in conversations_by_id.items()
+                        if c.title is not None
+                    ]
+                    stmt = stmt.where(UpstreamSession.parent_id.is_(None)).where(
+                        or_(
+                            func.coalesce(UpstreamSession.title, "").not_ilike(
+                                "%subagent%"
+                            ),
+                            UpstreamSession.id.in_(renamed),
                         )
-                    except Exception:
-                        pass
-
-                summary = ConversationSummary.model_validate(upstream)
-                summary.model = model_name
-                _apply_extensions(summary, conv)
-                results.append(summary)
+                    )
+                rows = upstream_db.execute(stmt).mappings().all()
+                model_names = _model_names_by_session(upstream_db, ids)
+
+                summaries = _SUMMARY_LIST_ADAPTER.validate_python(
+                    [
+                        {**row, "model": model_names.get(row["id"], "Unknown")}
+                        for row in rows
+                    ]
+                )
+                for summary in summaries:
+                    _apply_extensions(summary, conversations_by_id[summary.id])
+                    if top_level_only and _is_subagent_conversation(summary):
+                        continue
+                    results.append(summary)
+
+            if len(conversations) > UPSTREAM_FETCH_BATCH_SIZE:
+                # Each batch arrived sorted, so this only merges the sorted runs
+                results.sort(key=lambda s: s.time_updated or 0, reverse=True)
 
     except Exception as e:
         print(f"Warning: Failed to load conversations from DB: {e}", file=sys.stderr)
@@ -93,39 +170,12 @@ def list_conversations_from_db() -> List[ConversationSummary]:
 
 def list_conversations(show_all: bool = False) -> List[ConversationSummary]:
     """List all conversations from the DB, excluding archived, with extensions applied."""
-    archived_ids = get_archived_conversation_ids()
-
-    conversations_map = {
-        s.id: s for s in list_conversations_from_db() if s.id not in archived_ids
-    }
-
-    sorted_conversations = sorted(
-        conversations_map.values(), key=lambda s: s.time_updated or 0, reverse=True
-    )
-
-    if not show_all:
-        sorted_conversations = [
-            s
-            for s in sorted_conversations
-            if s.parent_id is None and "subagent" not in (s.title or "").lower()
-        ]
-
-    return sorted_conversations
+    return list_conversations_from_db(archived=False, top_level_only=not show_all)
 
 
 def list_archived_conversations() -> List[ConversationSummary]:
     """List archived conversations only, with extensions applied."""
-    archived_ids = get_archived_conversation_ids()
-    if not archived_ids:
-        return []
-
-    conversations_map = {
-        s.id: s for s in list_conversations_from_db() if s.id in archived_ids
-    }
-
-    return sorted(
-        conversations_map.values(), key=lambda s: s.time_updated or 0, reverse=True
-    )
+    return list_conversations_from_db(archived=True)
 
 
 def format_timestamp(ts: Optional[int]) -> str:
@@ -135,6 +185,14 @@ def format_timestamp(ts: Optional[int]) -> str:
     return datetime.fromtimestamp(ts / 1000).strftime("%Y-%m-%d %H:%M")
 
 
+def shorten_directory(directory: Optional[str], max_length: int = 40) -> str:
+    """Shorten a directory path for display, keeping its (most specific) tail."""
+    directory = directory or ""
+    if len(directory) > max_length:
+        return "..." + directory[-(max_length - 3) :]
+    return directory
+
+
 def load_conversation_export(conversation_id: str) -> ConversationExport | None:
     """Export a full conversation with messages, starting from the Conversation row.
 
@@ -152,10 +210,12 @@ def load_conversation_export(conversation_id: str) -> ConversationExport | None:
         if upstream_session is None:
             raise ValueError(f"Upstream data not found for {conversation_id=}")
 
+        # Parts load in one batched IN query instead of a lazy load per message
         stmt = (
             select(UpstreamMessage)
             .where(UpstreamMessage.session_id == upstream_session.id)
             .order_by(UpstreamMessage.time_created)
+            .options(selectinload(UpstreamMessage.parts))
         )
         messages = [Message.model_validate(m) for m in upstream_db.scalars(stmt).all()]
 
@@ -165,10 +225,62 @@ def load_conversation_export(conversation_id: str) -> ConversationExport | None:
         return ConversationExport(summary=summary, messages=messages)
 
 
+# Shortest query the trigram-tokenized part_fts index can match
+FTS_MIN_QUERY_LENGTH = 3
+
+
+# Doubles embedded quotes, the only character special inside an FTS5 string
+_FTS5_QUOTE_ESCAPES = str.maketrans({'"': '""'})
+
+
 def _escape_fts5_query(query: str) -> str:
     """Escape special FTS5 characters for literal/plaintext search."""
-    escaped = query.replace('"', '""')
-    return f'"{escaped}"'
+    return '"' + query.translate(_FTS5_QUOTE_ESCAPES) + '"'
+
+
+# re's parser is a private CPython module (sre_parse before 3.11), so a missing
+# one only disables the regex prefilter rather than breaking search
+try:
+    from re._constants import LITERAL, SUBPATTERN
+    from re._parser import parse as _parse_regex
+except ImportError:
+    _parse_regex = None
+
+
+def _required_literals(pattern: str) -> List[str]:
+    """Literal substrings that every match of a regex pattern must contain.
+
+    Only unbranched, unrepeated runs of 3+ printable ASCII characters are kept,
+    so the result can safely prefilter rows through the trigram FTS index.
+    Returns an empty list when nothing qualifies (the caller then scans).
+    """
+    if _parse_regex is None:
+        return []
+
+    literals: List[str] = []
+
+    def walk(items) -> None:
+        run: List[str] = []
+        for op, arg in items:
+            if op is LITERAL and 32 <= arg < 127:
+                run.append(chr(arg))
+                continue
+            if len(run) >= FTS_MIN_QUERY_LENGTH:
+                literals.append("".join(run))
+            run = []
+            if op is SUBPATTERN:
+                walk(arg[-1])  # An unquantified group is itself required
+        if len(run) >= FTS_MIN_QUERY_LENGTH:
+            literals.append("".join(run))
+
+    try:
+        walk(_parse_regex(pattern))
+    except (re.error, RecursionError):
+        return []
+    except (AttributeError, IndexError, TypeError):
+        # The private parser's output changed shape: scan without a prefilter
+        return []
+    return literals
 
 
 def _generate_snippet(
@@ -194,6 +306,143 @@ def _generate_snippet(
     return f"{prefix}<<MATCH>>{matched_text}<<END>>{suffix}"
 
 
+def _regex_search_sql(prefiltered: bool) -> str:
+    """SQL for a regex search, optionally narrowed by the trigram FTS index."""
+    if prefiltered:
+        source = f"""
+            part_fts f
+            JOIN {SearchPartIndex.__tablename__} p ON f.rowid = p.rowid
+        """
+        prefilter = "part_fts MATCH :prefilter AND"
+    else:
+        source = f"{SearchPartIndex.__tablename__} p"
+        prefilter = ""
+
+    # Same per-conversation grouping as the FTS search (earliest matches first),
+    # so content is only fetched, and snippets only generated in Python, for
+    # the rows that are actually rendered
+    return f"""
+        WITH hits AS (
+            SELECT
+                p.rowid as part_rowid,
+                p.upstream_session_id,
+                p.time_created,
+                s.time_updated
+            FROM {source}
+            JOIN {SearchConversationIndex.__tablename__} s ON p.upstream_session_id = s.id
+            WHERE {prefilter} p.content REGEXP :query
+                AND s.archived = 0
+                AND (:directory IS NULL OR s.directory LIKE :directory)
+        ),
+        ranked AS (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY upstream_session_id ORDER BY time_created
+                ) as rn,
+                COUNT(*) OVER (PARTITION BY upstream_session_id) as match_count
+            FROM hits
+        ),
+        page AS (
+            SELECT upstream_session_id FROM ranked
+            WHERE rn = 1
+            ORDER BY time_updated DESC, upstream_session_id
+            LIMIT :limit
+        ),
+        top AS (
+            SELECT r.* FROM ranked r
+            JOIN page USING (upstream_session_id)
+            WHERE r.rn <= 3
+        )
+        SELECT
+            p.id as part_id,
+            p.upstream_session_id,
+            p.message_id,
+            p.role,
+            p.content,
+            p.time_created,
+            s.title,
+            s.directory,
+            s.time_updated,
+            t.match_count
+        FROM top t
+        JOIN {SearchPartIndex.__tablename__} p ON p.rowid = t.part_rowid
+        JOIN {SearchConversationIndex.__tablename__} s ON s.id = t.upstream_session_id
+        ORDER BY t.time_updated DESC, t.upstream_session_id, t.rn
+    """
+
+
+# The search statements never vary with their inputs (an optional filter is a
+# NULL parameter, not extra SQL), so SQLAlchemy's compiled cache and sqlite3's
+# prepared-statement cache are hit on every search.
+_REGEX_SEARCH_SQL = text(_regex_search_sql(prefiltered=False))
+_PREFILTERED_REGEX_SEARCH_SQL = text(_regex_search_sql(prefiltered=True))
+
+# Ranks and counts matches per conversation in SQL, and pages by conversation,
+# so only the (at most 3) rendered matches of the first `limit` conversations
+# are returned and turned into models. Conversations are ordered by their best
+# bm25() score (lower is more relevant), most recently updated first on ties.
+# FTS5 can't evaluate snippet() next to window functions, so it is computed
+# last, by rowid, for the surviving rows only.
+_FTS_SEARCH_SQL = text(
+    f"""
+    WITH hits AS (
+        SELECT
+            p.rowid as part_rowid,
+            p.upstream_session_id,
+            s.time_updated,
+            bm25(part_fts) as score
+        FROM part_fts f
+        JOIN {SearchPartIndex.__tablename__} p ON f.rowid = p.rowid
+        JOIN {SearchConversationIndex.__tablename__} s ON p.upstream_session_id = s.id
+        WHERE part_fts MATCH :query
+            AND s.archived = 0
+            AND (:directory IS NULL OR s.directory LIKE :directory)
+    ),
+    ranked AS (
+        SELECT
+            *,
+            ROW_NUMBER() OVER (
+                PARTITION BY upstream_session_id ORDER BY score
+            ) as rn,
+            COUNT(*) OVER (PARTITION BY upstream_session_id) as match_count,
+            MIN(score) OVER (PARTITION BY upstream_session_id) as best_score
+        FROM hits
+    ),
+    page AS (
+        SELECT upstream_session_id FROM ranked
+        WHERE rn = 1
+        ORDER BY best_score, time_updated DESC, upstream_session_id
+        LIMIT :limit
+    ),
+    top AS (
+        SELECT r.* FROM ranked r
+        JOIN page USING (upstream_session_id)
+        WHERE r.rn <= 3
+    )
+    SELECT
+        p.id as part_id,
+        p.upstream_session_id,
+        p.message_id,
+        p.role,
+        -- Only the fallback for an empty snippet() needs the text
+        substr(p.content, 1, :snippet_length) as content_preview,
+        p.time_created,
+        s.title,
+        s.directory,
+        s.time_updated,
+        t.match_count,
+        snippet(part_fts, 0, '<<MATCH>>', '<<END>>', '...', :snippet_tokens) as snippet
+    FROM top t
+    JOIN part_fts f ON f.rowid = t.part_rowid
+    JOIN {SearchPartIndex.__tablename__} p ON p.rowid = t.part_rowid
+    JOIN {SearchConversationIndex.__tablename__} s ON s.id = t.upstream_session_id
+    WHERE part_fts MATCH :query
+    ORDER BY t.best_score, t.time_updated DESC, t.upstream_session_id, t.rn
+    """
+)
+
+
 def search_conversations(
     query: str,
     directory: Optional[str] = None,
@@ -220,172 +469,145 @@ def search_conversations(
     if not safe_query:
         return []
 
-    # Fetch archived IDs from db.py (the authoritative source for user intent)
-    archived_ids = get_archived_conversation_ids()
+    if not regex and len(safe_query) < FTS_MIN_QUERY_LENGTH:
+        # The trigram index can't match fewer than 3 characters; scan for the
+        # literal text instead
+        safe_query = re.escape(safe_query)
+        regex = True
 
+    params: dict = {
+        "directory": f"%{directory}%" if directory else None,
+        "limit": limit,
+    }
+
+    # Results are built with model_construct(): every field comes straight from
+    # the search index's typed columns, so per-row validation would be redundant
     results_map: dict[str, SearchResult] = {}
 
-    with get_search_session() as db:
+    with get_search_reader_session() as db:
         if regex:
             # Regex search: query part_index directly using REGEXP
             try:
-                pattern = re.compile(safe_query, re.IGNORECASE)
+                # Shared with the REGEXP function, so the SQL side reuses it too
+                pattern = compile_regex(safe_query)
             except re.error as e:
                 print(f"Invalid regex pattern: {e}", file=sys.stderr)
                 return []
 
-            sql = f"""
-                SELECT
-                    p.id as part_id,
-                    p.upstream_session_id,
-                    p.message_id,
-                    p.role,
-                    p.content,
-                    p.time_created,
-                    s.title,
-                    s.directory,
-                    s.time_updated
-                FROM {SearchPartIndex.__tablename__} p
-                JOIN {SearchConversationIndex.__tablename__} s ON p.upstream_session_id = s.id
-                WHERE p.content REGEXP :query
-            """
-
-            params: dict = {"query": safe_query}
-
-            if directory:
-                sql += " AND s.directory LIKE :directory"
-                params["directory"] = f"%{directory}%"
-
-            sql += " ORDER BY s.time_updated DESC LIMIT :limit"
-            params["limit"] = limit * 10
+            params["query"] = safe_query
+
+            # Literal runs the pattern requires let the trigram index narrow the
+            # candidates, so REGEXP only runs on rows that can possibly match
+            literals = _required_literals(safe_query)
+            if literals:
+                sql = _PREFILTERED_REGEX_SEARCH_SQL
+                params["prefilter"] = " AND ".join(map(_escape_fts5_query, literals))
+            else:
+                sql = _REGEX_SEARCH_SQL
 
             try:
-                rows = db.execute(text(sql), params).fetchall()
+                rows = db.execute(sql, params).fetchall()
             except Exception as e:
                 print(f"Regex search error: {e}", file=sys.stderr)
                 return []
 
-            # Group matches by conversation with manually generated snippets, excluding archived
+            # Snippets are generated here: FTS5's snippet() would highlight the
+            # prefilter's literals rather than what the regex actually matched
             for row in rows:
                 conversation_id = row.upstream_session_id
-                if conversation_id in archived_ids:
-                    continue
 
-                if conversation_id not in results_map:
-                    results_map[conversation_id] = SearchResult(
+                result = results_map.get(conversation_id)
+                if result is None:
+                    result = results_map[conversation_id] = SearchResult.model_construct(
                         conversation_id=conversation_id,
                         title=row.title,
                         directory=row.directory,
                         time_updated=row.time_updated,
                         matches=[],
-                        total_matches=0,
+                        total_matches=row.match_count,
                     )
 
-                result = results_map[conversation_id]
-                result.total_matches += 1
-
-                if len(result.matches) < 3:
-                    snippet = _generate_snippet(row.content, pattern, snippet_length)
-                    result.matches.append(
-                        SearchMatch(
-                            part_id=row.part_id,
-                            message_id=row.message_id,
-                            role=row.role,
-                            snippet=snippet,
-                            time_created=row.time_created,
-                        )
+                result.matches.append(
+                    SearchMatch.model_construct(
+                        part_id=row.part_id,
+                        message_id=row.message_id,
+                        role=row.role,
+                        snippet=_generate_snippet(row.content, pattern, snippet_length),
+                        time_created=row.time_created,
                     )
+                )
         else:
             # FTS5 search: escape query for literal/plaintext matching
-            fts_query = _escape_fts5_query(safe_query)
-
-            sql = f"""
-                SELECT
-                    p.id as part_id,
-                    p.upstream_session_id,
-                    p.message_id,
-                    p.role,
-                    p.content,
-                    p.time_created,
-                    s.title,
-                    s.directory,
-                    s.time_updated,
-                    snippet(part_fts, 0, '<<MATCH>>', '<<END>>', '...', :snippet_tokens) as snippet
-                FROM part_fts f
-                JOIN {SearchPartIndex.__tablename__} p ON f.rowid = p.rowid
-                JOIN {SearchConversationIndex.__tablename__} s ON p.upstream_session_id = s.id
-                WHERE part_fts MATCH :query
-            """
-
-            params = {
-                "query": fts_query,
-                "snippet_tokens": snippet_length // 5,
-            }
-
-            if directory:
-                sql += " AND s.directory LIKE :directory"
-                params["directory"] = f"%{directory}%"
-
-            sql += " ORDER BY s.time_updated DESC LIMIT :limit"
-            params["limit"] = limit * 10
+            params["query"] = _escape_fts5_query(safe_query)
+            # Trigram tokens are ~1 character each; snippet() allows at most 64
+            params["snippet_tokens"] = min(snippet_length, 64)
+            params["snippet_length"] = snippet_length
 
             try:
-                rows = db.execute(text(sql), params).fetchall()
+                rows = db.execute(_FTS_SEARCH_SQL, params).fetchall()
             except Exception as e:
                 print(f"Search query error: {e}", file=sys.stderr)
                 return []
 
-            # Group matches by conversation, excluding archived
             for row in rows:
                 conversation_id = row.upstream_session_id
-                if conversation_id in archived_ids:
-                    continue
 
-                if conversation_id not in results_map:
-                    results_map[conversation_id] = SearchResult(
+                result = results_map.get(conversation_id)
+                if result is None:
+                    result = results_map[conversation_id] = SearchResult.model_construct(
                         conversation_id=conversation_id,
                         title=row.title,
                         directory=row.directory,
                         time_updated=row.time_updated,
                         matches=[],
-                        total_matches=0,
+                        total_matches=row.match_count,
                     )
 
-                result = results_map[conversation_id]
-                result.total_matches += 1
-
-                if len(result.matches) < 3:
-                    result.matches.append(
-                        SearchMatch(
-                            part_id=row.part_id,
-                            message_id=row.message_id,
-                            role=row.role,
-                            snippet=row.snippet or row.content[:snippet_length],
-                            time_created=row.time_created,
-                        )
+                result.matches.append(
+                    SearchMatch.model_construct(
+                        part_id=row.part_id,
+                        message_id=row.message_id,
+                        role=row.role,
+                        snippet=row.snippet or row.content_preview,
+                        time_created=row.time_created,
                     )
+                )
 
-    return list(results_map.values())[:limit]
+    return list(results_map.values())
+
+
+# (directories, cached_at) for list_directories(); the set only changes when a
+# sync runs or a conversation is (un)archived, both of which clear it.
+_DIRECTORIES_CACHE_TTL = 10.0
+_directories_cache: Optional[tuple[tuple[str, ...], float]] = None
+
+
+def invalidate_directories_cache() -> None:
+    """Drop the cached list_directories() result."""
+    global _directories_cache
+    _directories_cache = None
 
 
 # FIXME replace with project query
 def list_directories() -> List[str]:
     """Get a list of unique directories from indexed conversations (excluding archived)."""
+    global _directories_cache
+
+    cached = _directories_cache
+    if cached is not None and time.monotonic() - cached[1] < _DIRECTORIES_CACHE_TTL:
+        return list(cached[0])
+
     if not Config.SEARCH_DB_PATH.exists():
         return []
 
-    archived_ids = get_archived_conversation_ids()
-
-    with get_search_session() as db:
+    with get_search_reader_session() as db:
         sql = f"""
             SELECT DISTINCT directory
             FROM {SearchConversationIndex.__tablename__}
-            WHERE directory IS NOT NULL AND directory != ''
+            WHERE directory IS NOT NULL AND directory != '' AND archived = 0
             ORDER BY directory
         """
-        rows = db.execute(text(sql)).fetchall()
-        # Post-filter: exclude directories that are only present in archived conversations.
-        # For simplicity we return all directories and let the UI/search handle exclusion.
-        # If a stricter filter is needed, cross-reference per-row upstream_session_id against archived_ids.
-        _ = archived_ids  # acknowledged; full per-directory filtering omitted for now
-        return [row[0] for row in rows]
+        directories = tuple(db.scalars(text(sql)))
+
+    _directories_cache = (directories, time.monotonic())
+    return list(directories)
@@ -4,8 +4,9 @@ Sync service for copying data from the upstream OpenCode DB to the search index.
 Performs incremental sync based on conversation (upstream: session) time_updated
 timestamps. Only user and assistant text content is indexed for search.
 
-Archived state is NOT managed here — it lives in db.py (.db) so that a full
-index rebuild never loses user intent.
+Archived state is owned by db.py (.db) so that a full index rebuild never loses
+user intent; every sync copies it onto conversation_index so queries can filter
+on it in SQL.
 """
 
 import sys
@@ -13,16 +14,25 @@ import time
 
 from typing import Optional
 
-from sqlalchemy import delete, select
+from sqlalchemy import delete, insert, select
 
 from app.config import Config
-from app.db import ensure_conversation_exists
+from app.db import bulk_ensure_conversations, get_archived_conversation_ids
 from app.db_search import (
     SearchConversationIndex,
     SearchPartIndex,
     SearchSyncMetadata,
-    get_search_session,
+    bulk_load_durability,
+    create_fts_triggers,
+    dispose_search_engines,
+    drop_fts_triggers,
+    exclusive_search_writer,
+    get_search_writer_session,
     init_search_db,
+    optimize_fts_index,
+    rebuild_fts_index,
+    refresh_planner_stats,
+    sync_archived_state,
 )
 from app.db_upstream import (
     UpstreamMessage,
@@ -30,6 +40,7 @@ from app.db_upstream import (
     UpstreamSession,
     get_upstream_session,
 )
+from app.services import invalidate_directories_cache
 
 
 def get_last_sync_time(search_db) -> Optional[int]:
@@ -54,30 +65,19 @@ def set_last_sync_time(search_db, timestamp: int):
         search_db.add(SearchSyncMetadata(key="last_sync_time", value=str(timestamp)))
 
 
-def extract_text_from_part(part: UpstreamPart) -> Optional[str]:
-    """Extract searchable text content from a part.
-
-    Only extracts text from 'text' type parts (user/assistant messages).
-    Skips tool calls, tool results, and other part types.
-    """
-    if part.type != "text":
-        return None
-    return part.text
-
-
 def sync_conversation(source_db, search_db, upstream_conv: UpstreamSession):
     """Sync a single upstream conversation and its parts to the search index.
 
+    The caller is responsible for creating the matching Conversation row in db.py
+    (sync_search_index does so for the whole batch via bulk_ensure_conversations).
+
     Args:
         source_db: SQLAlchemy session for the upstream (read-only) database
         search_db: SQLAlchemy session for the search index database
         upstream_conv: The upstream UpstreamSession record to sync
     """
-    # Ensure a Conversation row exists in db.py (the canonical root).
-    # This is an insert-or-ignore — user fields (title, slug, archived) are never touched.
-    ensure_conversation_exists(upstream_conv.id)
-
-    # Upsert conversation into the search index (archived state lives in db.py, not here)
+    # Upsert conversation into the search index (archived is reconciled separately
+    # by sync_archived_state, since db.py owns it)
     existing = search_db.get(SearchConversationIndex, upstream_conv.id)
     if existing:
         existing.directory = upstream_conv.directory
@@ -100,39 +100,43 @@ def sync_conversation(source_db, search_db, upstream_conv: UpstreamSession):
         )
     )
 
-    # Get all messages and parts for this conversation
-    messages = source_db.scalars(
-        select(UpstreamMessage).where(UpstreamMessage.session_id == upstream_conv.id)
+    # Fetch only indexable parts in one joined query: role, type and text are
+    # pulled out of the JSON by SQLite (see the hybrids in db_upstream).  Only
+    # 'text' parts of user/assistant messages are indexed; tool calls, tool
+    # results and other part types are skipped.
+    rows = source_db.execute(
+        select(
+            UpstreamPart.id,
+            UpstreamPart.message_id,
+            UpstreamMessage.role,
+            UpstreamPart.text,
+            UpstreamPart.time_created,
+        )
+        .join(UpstreamMessage, UpstreamPart.message_id == UpstreamMessage.id)
+        .where(
+            UpstreamMessage.session_id == upstream_conv.id,
+            UpstreamMessage.role.in_(("user", "assistant")),
+            UpstreamPart.type == "text",
+        )
     ).all()
 
-    parts_indexed = 0
-    for message in messages:
-        role = message.role
-        if role not in ("user", "assistant"):
-            continue
-
-        parts = source_db.scalars(
-            select(UpstreamPart).where(UpstreamPart.message_id == message.id)
-        ).all()
-
-        for part in parts:
-            text_content = extract_text_from_part(part)
-            if not text_content or not text_content.strip():
-                continue
-
-            search_db.add(
-                SearchPartIndex(
-                    id=part.id,
-                    upstream_session_id=upstream_conv.id,
-                    message_id=message.id,
-                    role=role,
-                    content=text_content,
-                    time_created=part.time_created,
-                )
-            )
-            parts_indexed += 1
-
-    return parts_indexed
+    part_rows = [
+        {
+            "id": row.id,
+            "upstream_session_id": upstream_conv.id,
+            "message_id": row.message_id,
+            "role": row.role,
+            "content": row.text,
+            "time_created": row.time_created,
+        }
+        for row in rows
+        if isinstance(row.text, str) and row.text.strip()
+    ]
+    if part_rows:
+        # One executemany instead of ORM unit-of-work bookkeeping per part
+        search_db.execute(insert(SearchPartIndex), part_rows)
+
+    return len(part_rows)
 
 
 def sync_search_index(force_full: bool = False):
@@ -145,6 +149,13 @@ def sync_search_index(force_full: bool = False):
         print("Upstream database not found, skipping sync", file=sys.stderr)
         return
 
+    with exclusive_search_writer(get_archived_conversation_ids):
+        _sync_search_index(force_full)
+    # Archive changes replayed on release may have hidden more directories
+    invalidate_directories_cache()
+
+
+def _sync_search_index(force_full: bool):
     # Initialize search database (creates tables if needed)
     init_search_db()
 
@@ -153,7 +164,7 @@ def sync_search_index(force_full: bool = False):
     parts_indexed = 0
 
     with get_upstream_session() as source_db:
-        with get_search_session() as search_db:
+        with get_search_writer_session() as search_db:
             last_sync = None if force_full else get_last_sync_time(search_db)
 
             if last_sync:
@@ -168,6 +179,9 @@ def sync_search_index(force_full: bool = False):
             upstream_conversations = source_db.scalars(stmt).all()
 
             if not upstream_conversations:
+                sync_archived_state(search_db, get_archived_conversation_ids())
+                search_db.commit()
+                invalidate_directories_cache()
                 elapsed = time.time() - start_time
                 print(
                     f"Search index up to date (checked in {elapsed:.2f}s)",
@@ -175,16 +189,43 @@ def sync_search_index(force_full: bool = False):
                 )
                 return
 
-            for upstream_conv in upstream_conversations:
-                parts_count = sync_conversation(source_db, search_db, upstream_conv)
-                conversations_synced += 1
-                parts_indexed += parts_count
+            full_rebuild = last_sync is None
+            with bulk_load_durability(search_db, enabled=full_rebuild):
+                if full_rebuild:
+                    # Bulk load: bypass the per-row FTS triggers (two FTS writes per
+                    # part) and rebuild part_fts in a single pass once every part is in.
+                    # If this sync dies midway, init_search_db restores the triggers.
+                    drop_fts_triggers(search_db)
+                    search_db.execute(delete(SearchPartIndex))
+
+                # Ensure a Conversation row exists in db.py (the canonical root) for every
+                # conversation in one batched insert-or-ignore — user fields (title, slug,
+                # archived) are never touched.
+                bulk_ensure_conversations(c.id for c in upstream_conversations)
+
+                for upstream_conv in upstream_conversations:
+                    parts_count = sync_conversation(source_db, search_db, upstream_conv)
+                    conversations_synced += 1
+                    parts_indexed += parts_count
 
-            # Update sync timestamp to current time (in milliseconds)
-            current_time_ms = int(time.time() * 1000)
-            set_last_sync_time(search_db, current_time_ms)
+                sync_archived_state(search_db, get_archived_conversation_ids())
 
-            search_db.commit()
+                if full_rebuild:
+                    rebuild_fts_index(search_db)
+                    create_fts_triggers(search_db)
+
+                # Update sync timestamp to current time (in milliseconds)
+                current_time_ms = int(time.time() * 1000)
+                set_last_sync_time(search_db, current_time_ms)
+
+                search_db.commit()
+
+                invalidate_directories_cache()
+
+                if full_rebuild:
+                    optimize_fts_index(search_db)
+                refresh_planner_stats(search_db, full=full_rebuild)
+                search_db.commit()
 
     elapsed = time.time() - start_time
     print(
@@ -200,6 +241,9 @@ def rebuild_search_index():
     Archived state is preserved automatically because it lives in db.py, not here.
     """
 
+    # Drop pooled connections first so nothing keeps writing to the unlinked file
+    dispose_search_engines()
+
     if Config.SEARCH_DB_PATH.exists():
         Config.SEARCH_DB_PATH.unlink()
 
@@ -42,6 +42,12 @@ cat > "$SERVICE_PLIST" <<EOF
         <string>127.0.0.1</string>
         <string>--port</string>
         <string>${SERVICE_PORT}</string>
+        <string>--loop</string>
+        <string>uvloop</string>
+        <string>--http</string>
+        <string>httptools</string>
+        <string>--timeout-keep-alive</string>
+        <string>30</string>
     </array>
 
     <key>WorkingDirectory</key>
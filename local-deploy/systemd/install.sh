@@ -29,7 +29,7 @@ After=network.target
 [Service]
 Type=simple
 WorkingDirectory=${PROD_DIR}
-ExecStart=${PROD_DIR}/.venv/bin/uvicorn app.main:app --host 127.0.0.1 --port ${SERVICE_PORT}
+ExecStart=${PROD_DIR}/.venv/bin/uvicorn app.main:app --host 127.0.0.1 --port ${SERVICE_PORT} --loop uvloop --http httptools --timeout-keep-alive 30
 Restart=on-failure
 RestartSec=5
 
@@ -6,9 +6,10 @@ Strategy
 All three databases (main/extensions, search/FTS5, upstream) are replaced
 with fresh temporary SQLite files for every test that needs them.
 
-Each app DB module now holds a module-level ``_engine``.  Fixtures here swap
-that engine out for one pointing at a temp file, then restore the original on
-teardown — no engine-per-call leaks, no ResourceWarnings.
+Each app DB module now holds module-level engines (the upstream DB's
+``_engine``, or a ``_writer_engine``/``_reader_engine`` pair for the main and
+search DBs).  Fixtures here swap them out for one pointing at a temp file, then
+restore the original on teardown — no engine-per-call leaks, no ResourceWarnings.
 """
 
 from __future__ import annotations
@@ -20,15 +21,16 @@ from typing import Generator
 
 import pytest
 
-from sqlalchemy import create_engine, event, text
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session
 
 import app.db as db_module
 import app.db_search as db_search_module
 import app.db_upstream as db_upstream_module
+import app.services as services_module
 
 from app.db import Base, Conversation
-from app.db_search import SearchBase, SearchConversationIndex, SearchPartIndex
+from app.db_search import SearchConversationIndex, SearchPartIndex, init_search_db
 from app.db_upstream import UpstreamBase, UpstreamMessage, UpstreamPart, UpstreamSession
 
 
@@ -60,7 +62,7 @@ def _make_search_engine(path: Path):
         cur = dbapi_connection.cursor()
         cur.execute("PRAGMA journal_mode=WAL")
         cur.close()
-        dbapi_connection.create_function("REGEXP", 2, _sqlite_regexp)
+        dbapi_connection.create_function("REGEXP", 2, _sqlite_regexp, deterministic=True)
 
     return engine
 
@@ -69,48 +71,6 @@ def _make_upstream_engine(path: Path):
     return create_engine(f"sqlite:///{path}")
 
 
-def _init_fts5(engine):
-    with engine.connect() as conn:
-        conn.execute(
-            text("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS part_fts USING fts5(
-                content,
-                content='part_index',
-                content_rowid='rowid',
-                tokenize='porter unicode61'
-            )
-        """)
-        )
-        conn.execute(
-            text("""
-            CREATE TRIGGER IF NOT EXISTS part_index_ai
-            AFTER INSERT ON part_index BEGIN
-                INSERT INTO part_fts(rowid, content) VALUES (NEW.rowid, NEW.content);
-            END
-        """)
-        )
-        conn.execute(
-            text("""
-            CREATE TRIGGER IF NOT EXISTS part_index_ad
-            AFTER DELETE ON part_index BEGIN
-                INSERT INTO part_fts(part_fts, rowid, content)
-                VALUES ('delete', OLD.rowid, OLD.content);
-            END
-        """)
-        )
-        conn.execute(
-            text("""
-            CREATE TRIGGER IF NOT EXISTS part_index_au
-            AFTER UPDATE ON part_index BEGIN
-                INSERT INTO part_fts(part_fts, rowid, content)
-                VALUES ('delete', OLD.rowid, OLD.content);
-                INSERT INTO part_fts(rowid, content) VALUES (NEW.rowid, NEW.content);
-            END
-        """)
-        )
-        conn.commit()
-
-
 # ---------------------------------------------------------------------------
 # Core fixtures
 # ---------------------------------------------------------------------------
@@ -119,16 +79,21 @@ def _init_fts5(engine):
 @pytest.fixture()
 def patched_config(tmp_path: Path, monkeypatch):
     """
-    Swap each module's ``_engine`` for one pointing at a temp SQLite file.
+    Swap each module's engine(s) for one pointing at a temp SQLite file.
     Restores the originals on teardown via monkeypatch.
     """
     main_engine = _make_main_engine(tmp_path / "main.db")
     search_engine = _make_search_engine(tmp_path / "search_index.db")
     upstream_engine = _make_upstream_engine(tmp_path / "opencode.db")
 
-    monkeypatch.setattr(db_module, "_engine", main_engine)
-    monkeypatch.setattr(db_search_module, "_engine", search_engine)
+    monkeypatch.setattr(db_module, "_writer_engine", main_engine)
+    monkeypatch.setattr(db_module, "_reader_engine", main_engine)
+    monkeypatch.setattr(db_search_module, "_writer_engine", search_engine)
+    monkeypatch.setattr(db_search_module, "_reader_engine", search_engine)
     monkeypatch.setattr(db_upstream_module, "_engine", upstream_engine)
+    monkeypatch.setattr(db_module, "_slug_cache", {})
+    monkeypatch.setattr(db_module, "_archived_ids", None)
+    monkeypatch.setattr(services_module, "_directories_cache", None)
 
     yield {
         "main_db_path": tmp_path / "main.db",
@@ -157,8 +122,7 @@ def main_db(patched_config):
 def search_db(patched_config):
     """Initialised search-index DB (including FTS5); yields an open Session."""
     engine = patched_config["search_engine"]
-    SearchBase.metadata.create_all(engine)
-    _init_fts5(engine)
+    init_search_db()
     with Session(engine) as session:
         yield session
 
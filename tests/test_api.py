@@ -1,12 +1,16 @@
 """
 Tests for the FastAPI application routes in app/main.py.
 
-The TestClient runs the real lifespan (init_db + sync_search_index), which
-is fine — all three DB engines are already pointed at temp files by
-``patched_config``, so startup just creates tables that already exist and
-syncs zero new records from the empty upstream DB.
+The TestClient runs the real lifespan (init_db + a background
+sync_search_index), which is fine — all three DB engines are already pointed
+at temp files by ``patched_config``, so startup just creates tables that
+already exist and re-syncs the fixture data into the search index.
 """
 
+import json
+import re
+import time
+
 import pytest
 
 from fastapi.testclient import TestClient
@@ -15,6 +19,8 @@ import app.main as main_module
 
 from app.db import set_conversation_archived
 
+from tests.conftest import make_upstream_part
+
 
 @pytest.fixture()
 def client(populated_dbs, patched_config):
@@ -44,6 +50,12 @@ class TestDashboard:
         assert "First Session" not in resp.text
 
 
+class TestTemplatePreload:
+    def test_page_templates_compiled_at_startup(self, client):
+        cached = {name for _, name in main_module.templates.env.cache}
+        assert set(main_module.PAGE_TEMPLATES) <= cached
+
+
 # ---------------------------------------------------------------------------
 # GET /archived
 # ---------------------------------------------------------------------------
@@ -78,6 +90,39 @@ class TestConversationPage:
         resp = client.get("/conversation/sess-1")
         assert "sess-1" in resp.text
 
+    def test_conversation_json_uses_field_names(self, client):
+        from app.services import load_conversation_export
+
+        resp = client.get("/conversation/sess-1")
+        embedded = re.search(
+            r'<script id="conversation-data" type="application/json">(.*?)</script>',
+            resp.text,
+            re.DOTALL,
+        )
+        data = json.loads(embedded.group(1))
+        assert "project_id" in data["summary"]
+        assert "projectID" not in data["summary"]
+        expected = load_conversation_export("sess-1").model_dump_json()
+        assert data == json.loads(expected)
+
+    def test_response_is_gzipped(self, client):
+        resp = client.get("/conversation/sess-1", headers={"Accept-Encoding": "gzip"})
+        assert resp.headers["content-encoding"] == "gzip"
+        assert "sess-1" in resp.text
+
+    def test_escapes_closing_tags_in_conversation_json(self, client, populated_dbs):
+        upstream_db = populated_dbs["upstream_db"]
+        upstream_db.add(
+            make_upstream_part(
+                id="part-x", message_id="msg-1", text="</script><b>pwned</b>"
+            )
+        )
+        upstream_db.commit()
+
+        resp = client.get("/conversation/sess-1")
+        assert "<\\/script><b>pwned<\\/b>" in resp.text
+        assert "</script><b>pwned" not in resp.text
+
 
 # ---------------------------------------------------------------------------
 # GET /api/search
@@ -95,6 +140,13 @@ class TestApiSearch:
         data = resp.json()
         assert isinstance(data, list)
 
+    def test_result_shape(self, client):
+        resp = client.get("/api/search", params={"q": "Hello"})
+        assert resp.headers["content-type"] == "application/json"
+        result = resp.json()[0]
+        assert {"conversation_id", "title", "matches", "total_matches"} <= set(result)
+        assert result["matches"][0]["snippet"]
+
     def test_empty_query_returns_empty_list(self, client):
         resp = client.get("/api/search", params={"q": "   "})
         assert resp.status_code == 200
@@ -139,6 +191,34 @@ class TestApiDirectories:
         assert "/proj/a" in dirs
         assert "/proj/b" in dirs
 
+    def test_etag_revalidation_returns_304(self, client):
+        first = client.get("/api/directories")
+        etag = first.headers["etag"]
+        resp = client.get("/api/directories", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.headers["etag"] == etag
+
+
+# ---------------------------------------------------------------------------
+# /static
+# ---------------------------------------------------------------------------
+
+
+class TestStaticAssets:
+    def test_pages_link_fingerprinted_assets(self, client):
+        resp = client.get("/")
+        assert "/static/css/base.css?v=" in resp.text
+
+    def test_fingerprinted_assets_are_immutable(self, client):
+        url = main_module.static_url("css/base.css")
+        resp = client.get(url)
+        assert resp.status_code == 200
+        assert "immutable" in resp.headers["cache-control"]
+
+    def test_plain_assets_must_revalidate(self, client):
+        resp = client.get("/static/css/base.css")
+        assert resp.headers["cache-control"] == "no-cache"
+
 
 # ---------------------------------------------------------------------------
 # POST /api/sync
@@ -152,6 +232,21 @@ class TestApiSync:
         assert resp.json() == {"status": "ok"}
 
 
+# ---------------------------------------------------------------------------
+# GET /api/sync/status
+# ---------------------------------------------------------------------------
+
+
+class TestApiSyncStatus:
+    def test_reports_ok_once_startup_sync_finishes(self, client):
+        deadline = time.monotonic() + 5
+        status = client.get("/api/sync/status").json()["status"]
+        while status == "running" and time.monotonic() < deadline:
+            time.sleep(0.01)
+            status = client.get("/api/sync/status").json()["status"]
+        assert status == "ok"
+
+
 # ---------------------------------------------------------------------------
 # POST /api/conversation/{id}/archive
 # ---------------------------------------------------------------------------
@@ -194,6 +289,95 @@ class TestApiUnarchive:
         assert status_resp.json()["archived"] is False
 
 
+# ---------------------------------------------------------------------------
+# POST /api/conversations/archive
+# ---------------------------------------------------------------------------
+
+
+class TestApiArchiveBatch:
+    def test_archives_many(self, client):
+        resp = client.post(
+            "/api/conversations/archive", json={"ids": ["sess-1", "sess-2"]}
+        )
+        assert resp.status_code == 200
+        assert resp.json() == {
+            "status": "archived",
+            "conversation_ids": ["sess-1", "sess-2"],
+        }
+        bulk = client.get("/api/archived/bulk?id=sess-1&id=sess-2").json()
+        assert bulk == {"sess-1": True, "sess-2": True}
+
+    def test_unarchives_many(self, client):
+        client.post("/api/conversations/archive", json={"ids": ["sess-1", "sess-2"]})
+        resp = client.post(
+            "/api/conversations/archive",
+            json={"ids": ["sess-1", "sess-2"], "archived": False},
+        )
+        assert resp.json()["status"] == "unarchived"
+        bulk = client.get("/api/archived/bulk?id=sess-1&id=sess-2").json()
+        assert bulk == {"sess-1": False, "sess-2": False}
+
+    def test_rejects_empty_list(self, client):
+        resp = client.post("/api/conversations/archive", json={"ids": []})
+        assert resp.status_code == 422
+
+    def test_does_not_wait_for_a_running_sync(self, client):
+        from app.db import get_archived_conversation_ids
+        from app.db_search import exclusive_search_writer
+
+        with exclusive_search_writer(get_archived_conversation_ids):
+            started = time.monotonic()
+            resp = client.post(
+                "/api/conversations/archive", json={"ids": ["sess-1", "sess-2"]}
+            )
+            assert resp.status_code == 200
+            assert time.monotonic() - started < 5
+
+        # The skipped mirror is replayed once the writer is released
+        resp = client.get("/api/search", params={"q": "Hello"})
+        assert resp.json() == []
+
+    def test_single_archive_overlapping_a_batch_is_not_lost(self, client, monkeypatch):
+        import threading
+
+        import app.db_search as db_search_module
+
+        deadline = time.monotonic() + 5
+        while client.get("/api/sync/status").json()["status"] == "running":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        in_update, finish_update = threading.Event(), threading.Event()
+        get_session = db_search_module.get_search_writer_session
+
+        def slow_first_session():
+            # Only the batch's mirror UPDATE (the first writer session) stalls
+            if not in_update.is_set():
+                in_update.set()
+                finish_update.wait(5)
+            return get_session()
+
+        monkeypatch.setattr(
+            db_search_module, "get_search_writer_session", slow_first_session
+        )
+        batch = threading.Thread(
+            target=client.post,
+            args=("/api/conversations/archive",),
+            kwargs={"json": {"ids": ["sess-1", "sess-3"]}},
+        )
+        batch.start()
+        assert in_update.wait(5)
+
+        # The batch's mirror holds the writer: this one is flagged, not dropped
+        resp = client.post("/api/conversation/sess-2/archive")
+        assert resp.status_code == 200
+
+        finish_update.set()
+        batch.join(5)
+        resp = client.get("/api/search", params={"q": "Hello"})
+        assert resp.json() == []
+
+
 # ---------------------------------------------------------------------------
 # GET /api/conversation/{id}/archived
 # ---------------------------------------------------------------------------
@@ -216,3 +400,20 @@ class TestApiArchivedStatus:
         resp = client.get("/api/conversation/unknown-xyz/archived")
         assert resp.status_code == 200
         assert resp.json()["archived"] is False
+
+
+# ---------------------------------------------------------------------------
+# GET /api/archived/bulk
+# ---------------------------------------------------------------------------
+
+
+class TestApiArchivedStatusBulk:
+    def test_returns_status_per_id(self, client):
+        set_conversation_archived("sess-2", archived=True)
+        resp = client.get("/api/archived/bulk?id=sess-1&id=sess-2&id=unknown-xyz")
+        assert resp.status_code == 200
+        assert resp.json() == {"sess-1": False, "sess-2": True, "unknown-xyz": False}
+
+    def test_requires_ids(self, client):
+        resp = client.get("/api/archived/bulk")
+        assert resp.status_code == 422
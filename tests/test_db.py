@@ -2,19 +2,49 @@
 Tests for app/db.py — the extensions (main.db) CRUD layer.
 """
 
+from sqlalchemy import text
+
 from app.db import (
     Conversation,
+    bulk_ensure_conversations,
     delete_conversation,
     ensure_conversation_exists,
     get_archived_conversation_ids,
+    get_archived_status,
     get_conversation,
     get_conversation_by_slug,
+    init_db,
     is_conversation_archived,
     set_conversation_archived,
+    set_conversations_archived,
     upsert_conversation,
 )
 
 
+class TestInitDb:
+    def test_adds_missing_indexes_to_existing_table(self, patched_config):
+        engine = patched_config["main_engine"]
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE conversation ("
+                    "upstream_session_id VARCHAR PRIMARY KEY, title VARCHAR, "
+                    "slug VARCHAR, archived BOOLEAN NOT NULL)"
+                )
+            )
+
+        init_db()
+
+        with engine.connect() as conn:
+            names = {
+                row[0]
+                for row in conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE type='index'")
+                )
+            }
+        assert "ix_conversation_archived" in names
+
+
 class TestEnsureConversationExists:
     def test_creates_row_when_missing(self, main_db, patched_config):
         ensure_conversation_exists("sess-new")
@@ -45,6 +75,30 @@ class TestEnsureConversationExists:
         assert row.archived is True
 
 
+class TestBulkEnsureConversations:
+    def test_creates_missing_rows(self, main_db, patched_config):
+        bulk_ensure_conversations(["bulk-1", "bulk-2"])
+        for id_ in ("bulk-1", "bulk-2"):
+            row = get_conversation(id_)
+            assert row is not None
+            assert row.archived is False
+
+    def test_does_not_overwrite_existing_rows(self, main_db, patched_config):
+        main_db.add(
+            Conversation(upstream_session_id="bulk-existing", title="Mine", archived=True)
+        )
+        main_db.commit()
+
+        bulk_ensure_conversations(["bulk-existing", "bulk-new"])
+        row = get_conversation("bulk-existing")
+        assert row.title == "Mine"
+        assert row.archived is True
+        assert get_conversation("bulk-new") is not None
+
+    def test_empty_input_is_a_noop(self, main_db, patched_config):
+        bulk_ensure_conversations([])
+
+
 class TestGetConversation:
     def test_returns_none_for_missing(self, main_db, patched_config):
         assert get_conversation("does-not-exist") is None
@@ -73,6 +127,21 @@ class TestGetConversationBySlug:
         main_db.commit()
         assert get_conversation_by_slug("wrong-slug") is None
 
+    def test_cached_slug_follows_rename(self, main_db, patched_config):
+        upsert_conversation("sess-rename", slug="before")
+        assert get_conversation_by_slug("before").upstream_session_id == "sess-rename"
+
+        upsert_conversation("sess-rename", slug="after")
+        assert get_conversation_by_slug("before") is None
+        assert get_conversation_by_slug("after").upstream_session_id == "sess-rename"
+
+    def test_cached_slug_cleared_on_delete(self, main_db, patched_config):
+        upsert_conversation("sess-gone", slug="gone")
+        assert get_conversation_by_slug("gone") is not None
+
+        delete_conversation("sess-gone")
+        assert get_conversation_by_slug("gone") is None
+
 
 class TestUpsertConversation:
     def test_creates_row_if_not_exists(self, main_db, patched_config):
@@ -140,6 +209,39 @@ class TestArchivedState:
     def test_is_archived_returns_false_for_missing_row(self, main_db, patched_config):
         assert is_conversation_archived("totally-unknown") is False
 
+    def test_is_archived_served_from_process_cache(self, main_db, patched_config):
+        set_conversation_archived("sess-cached", archived=True)
+        assert is_conversation_archived("sess-cached") is True
+
+        # Once loaded, the in-process set is authoritative for reads
+        main_db.get(Conversation, "sess-cached").archived = False
+        main_db.commit()
+        assert is_conversation_archived("sess-cached") is True
+
+    def test_delete_clears_archived_cache(self, main_db, patched_config):
+        set_conversation_archived("sess-del", archived=True)
+        assert is_conversation_archived("sess-del") is True
+        delete_conversation("sess-del")
+        assert is_conversation_archived("sess-del") is False
+
+    def test_set_many_archived(self, main_db, patched_config):
+        main_db.add(Conversation(upstream_session_id="existing"))
+        main_db.commit()
+
+        set_conversations_archived(["existing", "new", "new"], archived=True)
+
+        assert get_archived_conversation_ids() == {"existing", "new"}
+        assert is_conversation_archived("new") is True
+
+    def test_get_archived_status(self, main_db, patched_config):
+        set_conversation_archived("sess-a", archived=True)
+        set_conversation_archived("sess-b", archived=False)
+        assert get_archived_status(["sess-a", "sess-b", "unknown"]) == {
+            "sess-a": True,
+            "sess-b": False,
+            "unknown": False,
+        }
+
 
 class TestGetArchivedConversationIds:
     def test_empty_when_none_archived(self, main_db, patched_config):
@@ -3,15 +3,22 @@ Tests for app/db_search.py — search-index database initialisation, FTS5,
 and the REGEXP helper.
 """
 
+import threading
+
 from sqlalchemy import text
 
 import app.db_search as db_search_module
 
 from app.db_search import (
+    SearchConversationIndex,
     SearchPartIndex,
     SearchSyncMetadata,
     _sqlite_regexp,
+    bulk_load_durability,
+    compile_regex,
+    exclusive_search_writer,
     init_search_db,
+    mirror_archived_state,
 )
 
 
@@ -43,6 +50,9 @@ class TestSqliteRegexp:
         assert _sqlite_regexp("^start", "start of string") is True
         assert _sqlite_regexp("^start", "not at start") is False
 
+    def test_compiled_pattern_is_cached(self):
+        assert compile_regex("cached.*pattern") is compile_regex("cached.*pattern")
+
 
 # ---------------------------------------------------------------------------
 # init_search_db — schema creation
@@ -54,7 +64,7 @@ class TestInitSearchDb:
         """init_search_db must create all tables including the FTS5 virtual table."""
         init_search_db()
 
-        with db_search_module._engine.connect() as conn:
+        with db_search_module._writer_engine.connect() as conn:
             # Verify regular tables exist
             for table in ("conversation_index", "part_index", "sync_metadata"):
                 result = conn.execute(
@@ -79,6 +89,99 @@ class TestInitSearchDb:
         init_search_db()
         init_search_db()  # Second call should be a no-op
 
+    def test_rebuilds_outdated_fts_table(self, patched_config):
+        """A part_fts built with an older definition is replaced and re-indexed."""
+        init_search_db()
+        with db_search_module._writer_engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO part_index "
+                    "(id, upstream_session_id, message_id, role, content) "
+                    "VALUES ('p1', 's1', 'm1', 'user', 'call get_search_reader_session')"
+                )
+            )
+            db_search_module.drop_fts_triggers(conn)
+            conn.execute(text("DROP TABLE part_fts"))
+            conn.execute(
+                text(
+                    "CREATE VIRTUAL TABLE part_fts USING fts5(content, "
+                    "content='part_index', content_rowid='rowid', "
+                    "tokenize='porter unicode61')"
+                )
+            )
+            conn.execute(
+                text(
+                    "UPDATE sync_metadata SET value = '1' WHERE key = 'fts_schema_version'"
+                )
+            )
+
+        init_search_db()
+
+        with db_search_module._writer_engine.connect() as conn:
+            hits = conn.execute(
+                text("SELECT rowid FROM part_fts WHERE part_fts MATCH '\"search_rea\"'")
+            ).fetchall()
+            version = conn.scalar(
+                text("SELECT value FROM sync_metadata WHERE key = 'fts_schema_version'")
+            )
+        assert len(hits) == 1
+        assert version == db_search_module.FTS_SCHEMA_VERSION
+
+    def test_restores_missing_fts_triggers(self, patched_config):
+        """A full sync that died mid bulk-load must not leave the triggers dropped."""
+        init_search_db()
+        with db_search_module._writer_engine.begin() as conn:
+            db_search_module.drop_fts_triggers(conn)
+
+        init_search_db()
+
+        with db_search_module._writer_engine.connect() as conn:
+            triggers = conn.scalars(
+                text("SELECT name FROM sqlite_master WHERE type='trigger'")
+            ).all()
+        assert set(triggers) == {"part_index_ai", "part_index_ad", "part_index_au"}
+
+    def test_adds_archived_column_to_existing_index(self, patched_config):
+        """A conversation_index created before the archived mirror gets migrated."""
+        with db_search_module._writer_engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE conversation_index ("
+                    "id VARCHAR PRIMARY KEY, directory VARCHAR, "
+                    "title VARCHAR, time_updated INTEGER)"
+                )
+            )
+            conn.execute(text("INSERT INTO conversation_index (id) VALUES ('old')"))
+
+        init_search_db()
+
+        with db_search_module._writer_engine.connect() as conn:
+            archived = conn.execute(
+                text("SELECT archived FROM conversation_index WHERE id = 'old'")
+            ).scalar_one()
+            index = conn.execute(
+                text(
+                    "SELECT name FROM sqlite_master "
+                    "WHERE type='index' AND name='ix_conv_idx_updated_archived'"
+                )
+            ).fetchone()
+        assert archived == 0
+        assert index is not None
+
+    def test_directory_listing_uses_partial_index(self, patched_config):
+        init_search_db()
+
+        with db_search_module._writer_engine.connect() as conn:
+            plan = conn.execute(
+                text(
+                    "EXPLAIN QUERY PLAN SELECT DISTINCT directory "
+                    "FROM conversation_index "
+                    "WHERE directory IS NOT NULL AND directory != '' AND archived = 0 "
+                    "ORDER BY directory"
+                )
+            ).fetchall()
+        assert any("ix_conv_idx_active_directory" in row[-1] for row in plan)
+
 
 # ---------------------------------------------------------------------------
 # FTS5 triggers — INSERT/DELETE/UPDATE propagation
@@ -195,6 +298,106 @@ class TestRegexpFunction:
         assert len(result) == 0
 
 
+# ---------------------------------------------------------------------------
+# bulk_load_durability
+# ---------------------------------------------------------------------------
+
+
+class TestBulkLoadDurability:
+    def _synchronous(self, session):
+        return session.execute(text("PRAGMA synchronous")).scalar_one()
+
+    def test_relaxes_then_restores_synchronous(self, search_db):
+        with bulk_load_durability(search_db):
+            assert self._synchronous(search_db) == 0
+        assert self._synchronous(search_db) == 1
+
+    def test_disabled_is_a_noop(self, search_db):
+        before = self._synchronous(search_db)
+        with bulk_load_durability(search_db, enabled=False):
+            assert self._synchronous(search_db) == before
+
+
+# ---------------------------------------------------------------------------
+# mirror_archived_state / exclusive_search_writer
+# ---------------------------------------------------------------------------
+
+
+class TestMirrorArchivedState:
+    def _archived(self, session, id_):
+        session.expire_all()
+        return session.get(SearchConversationIndex, id_).archived
+
+    def _add_index_rows(self, session, *ids):
+        session.add_all(SearchConversationIndex(id=id_) for id_ in ids)
+        session.commit()
+
+    def test_writes_when_writer_is_free(self, search_db):
+        self._add_index_rows(search_db, "s1")
+
+        mirror_archived_state(["s1"], True, lambda: {"s1"})
+
+        assert self._archived(search_db, "s1") is True
+
+    def test_skips_and_reconciles_while_sync_holds_writer(self, search_db):
+        self._add_index_rows(search_db, "s1")
+        reads = []
+
+        def archived_ids():
+            reads.append(True)
+            return {"s1"}
+
+        with exclusive_search_writer(archived_ids):
+            # Would deadlock if it waited for the (non-reentrant) writer lock
+            mirror_archived_state(["s1"], True, archived_ids)
+            assert self._archived(search_db, "s1") is False
+            assert reads == []
+
+        assert reads == [True]
+        assert self._archived(search_db, "s1") is True
+        mirror_archived_state(["s1"], False, set)  # Lock released again afterwards
+        assert self._archived(search_db, "s1") is False
+
+    def test_no_reconcile_without_skipped_mirrors(self, search_db):
+        reads = []
+        with exclusive_search_writer(lambda: reads.append(True) or ()):
+            pass
+        assert reads == []
+
+    def test_mirror_skipped_behind_another_mirror_is_replayed(
+        self, search_db, monkeypatch
+    ):
+        self._add_index_rows(search_db, "s1", "s2")
+        archived = {"s1", "s2"}  # db.py's state after both archive calls
+        in_update, finish_update = threading.Event(), threading.Event()
+        get_session = db_search_module.get_search_writer_session
+
+        def slow_first_session():
+            if threading.current_thread() is first:
+                in_update.set()
+                finish_update.wait(5)
+            return get_session()
+
+        monkeypatch.setattr(
+            db_search_module, "get_search_writer_session", slow_first_session
+        )
+        first = threading.Thread(
+            target=mirror_archived_state, args=(["s1"], True, lambda: archived)
+        )
+        first.start()
+        assert in_update.wait(5)
+
+        # The first mirror holds the writer: this one is only flagged
+        mirror_archived_state(["s2"], True, lambda: archived)
+        assert self._archived(search_db, "s2") is False
+
+        finish_update.set()
+        first.join(5)
+        assert self._archived(search_db, "s1") is True
+        assert self._archived(search_db, "s2") is True
+        assert db_search_module._archived_mirror_stale is False
+
+
 # ---------------------------------------------------------------------------
 # sync_metadata round-trip
 # ---------------------------------------------------------------------------
@@ -4,21 +4,31 @@ Tests for app/services.py — the business-logic layer.
 
 import re
 
+from sqlalchemy import event
+
+import app.services as services_module
+
 from app.db import Conversation
+from app.db_search import SearchConversationIndex, SearchPartIndex
 from app.models import ConversationSummary
 from app.services import (
     _apply_extensions,
     _escape_fts5_query,
     _generate_snippet,
+    _required_literals,
     format_timestamp,
+    invalidate_directories_cache,
     list_archived_conversations,
     list_conversations,
     list_directories,
     load_conversation_export,
     search_conversations,
+    shorten_directory,
 )
 
 from tests.conftest import (
+    make_upstream_message,
+    make_upstream_part,
     make_upstream_session,
 )
 
@@ -46,6 +56,26 @@ class TestFormatTimestamp:
         assert format_timestamp(0) == "Unknown"
 
 
+# ---------------------------------------------------------------------------
+# shorten_directory
+# ---------------------------------------------------------------------------
+
+
+class TestShortenDirectory:
+    def test_short_path_unchanged(self):
+        assert shorten_directory("/proj/a") == "/proj/a"
+
+    def test_long_path_keeps_tail(self):
+        directory = "/home/user/" + "x" * 50 + "/project"
+        result = shorten_directory(directory)
+        assert len(result) == 40
+        assert result.startswith("...")
+        assert result.endswith("/project")
+
+    def test_none_returns_empty(self):
+        assert shorten_directory(None) == ""
+
+
 # ---------------------------------------------------------------------------
 # _escape_fts5_query
 # ---------------------------------------------------------------------------
@@ -62,6 +92,37 @@ class TestEscapeFts5Query:
         assert _escape_fts5_query("") == '""'
 
 
+# ---------------------------------------------------------------------------
+# _required_literals
+# ---------------------------------------------------------------------------
+
+
+class TestRequiredLiterals:
+    def test_extracts_runs_around_wildcards(self):
+        assert _required_literals("Hello.*user") == ["Hello", "user"]
+
+    def test_recurses_into_plain_groups(self):
+        assert _required_literals("def (get_\\w+)") == ["def ", "get_"]
+
+    def test_skips_optional_and_alternated_parts(self):
+        assert _required_literals("(foobar)?|bazqux") == []
+        assert _required_literals("abc(?:defg)*") == ["abc"]
+
+    def test_ignores_short_runs(self):
+        assert _required_literals("ab.cd") == []
+
+    def test_invalid_pattern_returns_empty(self):
+        assert _required_literals("[invalid") == []
+
+    def test_without_private_parser_returns_empty(self, monkeypatch):
+        monkeypatch.setattr(services_module, "_parse_regex", None)
+        assert _required_literals("Hello.*user") == []
+
+    def test_unexpected_parser_output_returns_empty(self, monkeypatch):
+        monkeypatch.setattr(services_module, "_parse_regex", lambda pattern: [None])
+        assert _required_literals("Hello.*user") == []
+
+
 # ---------------------------------------------------------------------------
 # _generate_snippet
 # ---------------------------------------------------------------------------
@@ -159,6 +220,31 @@ class TestListConversations:
         ids = [c.id for c in conversations]
         assert "sess-sub" not in ids
 
+    def test_excludes_child_sessions(self, populated_dbs, upstream_db, main_db):
+        child = make_upstream_session(id="sess-child", parent_id="sess-1")
+        upstream_db.add(child)
+        upstream_db.commit()
+        main_db.add(Conversation(upstream_session_id="sess-child", archived=False))
+        main_db.commit()
+
+        ids = [c.id for c in list_conversations()]
+        assert "sess-child" not in ids
+        assert "sess-child" in [c.id for c in list_conversations(show_all=True)]
+
+    def test_subagent_filter_uses_custom_title(self, populated_dbs, upstream_db, main_db):
+        upstream_db.add(make_upstream_session(id="sess-sub3", title="Subagent run"))
+        upstream_db.commit()
+        main_db.add(
+            Conversation(upstream_session_id="sess-sub3", title="Renamed", archived=False)
+        )
+        main_db.get(Conversation, "sess-2").title = "my subagent notes"
+        main_db.commit()
+
+        ids = [c.id for c in list_conversations()]
+
+        assert "sess-sub3" in ids
+        assert "sess-2" not in ids
+
     def test_show_all_includes_subagents(self, populated_dbs, upstream_db, main_db):
         sub = make_upstream_session(id="sess-sub2", title="subagent task")
         upstream_db.add(sub)
@@ -170,11 +256,65 @@ class TestListConversations:
         ids = [c.id for c in conversations]
         assert "sess-sub2" in ids
 
+    def test_model_from_first_message_naming_one(self, populated_dbs, upstream_db):
+        legacy = make_upstream_message(id="msg-legacy", session_id="sess-2")
+        legacy.data = '{"role": "assistant", "modelID": "gpt-4o"}'
+        later = make_upstream_message(
+            id="msg-later",
+            session_id="sess-1",
+            model_id="other-model",
+            time_created=1_700_000_009_000,
+        )
+        upstream_db.add_all([legacy, later])
+        upstream_db.commit()
+
+        models = {c.id: c.model for c in list_conversations()}
+
+        assert models == {"sess-1": "claude-3-5-sonnet", "sess-2": "gpt-4o"}
+
+    def test_summary_fields_come_from_upstream(self, populated_dbs):
+        summary = next(c for c in list_conversations() if c.id == "sess-1")
+        assert summary.title == "First Session"
+        assert summary.directory == "/proj/a"
+        assert summary.project_id == "proj-1"
+        assert summary.time_updated == 1_700_000_001_000
+
+    def test_model_unknown_without_model_messages(self, populated_dbs):
+        models = {c.id: c.model for c in list_conversations()}
+        assert models["sess-2"] == "Unknown"
+
+    def test_fetches_upstream_in_batches(self, populated_dbs, monkeypatch):
+        monkeypatch.setattr(services_module, "UPSTREAM_FETCH_BATCH_SIZE", 1)
+        models = {c.id: c.model for c in list_conversations()}
+        assert models == {"sess-1": "claude-3-5-sonnet", "sess-2": "Unknown"}
+
+    def test_skips_conversations_missing_upstream(self, populated_dbs, main_db):
+        main_db.add(Conversation(upstream_session_id="gone", archived=False))
+        main_db.commit()
+        ids = {c.id for c in list_conversations()}
+        assert ids == {"sess-1", "sess-2"}
+
     def test_sorted_by_time_updated_desc(self, populated_dbs):
         conversations = list_conversations()
         times = [c.time_updated for c in conversations if c.time_updated]
         assert times == sorted(times, reverse=True)
 
+    def test_sorted_across_batches(
+        self, populated_dbs, upstream_db, main_db, monkeypatch
+    ):
+        for i in range(3):
+            upstream_db.add(
+                make_upstream_session(id=f"sess-b{i}", time_updated=1_700_000_000_500 + i)
+            )
+            main_db.add(Conversation(upstream_session_id=f"sess-b{i}", archived=False))
+        upstream_db.commit()
+        main_db.commit()
+        monkeypatch.setattr(services_module, "UPSTREAM_FETCH_BATCH_SIZE", 2)
+
+        ids = [c.id for c in list_conversations()]
+
+        assert ids == ["sess-2", "sess-1", "sess-b2", "sess-b1", "sess-b0"]
+
 
 # ---------------------------------------------------------------------------
 # list_archived_conversations
@@ -216,6 +356,30 @@ class TestLoadConversationExport:
         assert result is not None
         assert len(result.messages) >= 1
 
+    def test_loads_parts_without_per_message_queries(
+        self, populated_dbs, upstream_db, patched_config
+    ):
+        upstream_db.add_all(
+            [make_upstream_message(id=f"msg-x{i}", session_id="sess-1") for i in range(5)]
+            + [
+                make_upstream_part(id=f"part-x{i}", message_id=f"msg-x{i}")
+                for i in range(5)
+            ]
+        )
+        upstream_db.commit()
+
+        statements = []
+        event.listen(
+            patched_config["upstream_engine"],
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        result = load_conversation_export("sess-1")
+
+        assert len(result.messages) == 6
+        assert all(len(m.parts) == 1 for m in result.messages)
+        assert len(statements) == 3  # session, messages, parts
+
     def test_extension_title_applied(self, populated_dbs, main_db):
         # Give sess-1 a custom title via the extensions DB
         from app.db import upsert_conversation
@@ -264,6 +428,42 @@ class TestSearchConversationsFts:
         for r in results:
             assert r.total_matches >= 1
 
+    def test_counts_all_matches_but_returns_top_three(self, populated_dbs):
+        search_db = populated_dbs["search_db"]
+        search_db.add_all(
+            SearchPartIndex(
+                id=f"extra-{i}",
+                upstream_session_id="sess-1",
+                message_id="msg-1",
+                role="user",
+                content=f"Hello again {i}",
+                time_created=1_700_000_000_700 + i,
+            )
+            for i in range(4)
+        )
+        search_db.commit()
+
+        assert len(search_conversations("Hello", limit=1)) == 1
+        results = search_conversations("Hello")
+        sess1 = next(r for r in results if r.conversation_id == "sess-1")
+        assert sess1.total_matches == 5
+        assert len(sess1.matches) == 3
+
+    def test_orders_by_relevance_before_recency(self, populated_dbs):
+        # sess-2 is newer, but the shorter sess-1 part scores better in bm25()
+        results = search_conversations("from")
+        assert [r.conversation_id for r in results] == ["sess-1", "sess-2"]
+
+    def test_matches_substrings(self, populated_dbs):
+        results = search_conversations("ello fro")
+        assert {r.conversation_id for r in results} == {"sess-1", "sess-2"}
+
+    def test_short_query_falls_back_to_literal_scan(self, populated_dbs):
+        results = search_conversations("r?")  # Too short for trigrams; not a regex
+        assert results == []
+        results = search_conversations("om")
+        assert {r.conversation_id for r in results} == {"sess-1", "sess-2"}
+
     def test_no_search_data_returns_empty(self, main_db, patched_config):
         """When the search index has no data, return an empty list."""
         results = search_conversations("anything")
@@ -292,6 +492,38 @@ class TestSearchConversationsRegex:
         ids = [r.conversation_id for r in results]
         assert "sess-2" not in ids
 
+    def test_regex_with_literals_uses_prefilter(self, populated_dbs):
+        results = search_conversations("from (user|assistant)$", regex=True)
+        assert {r.conversation_id for r in results} == {"sess-1", "sess-2"}
+        results = search_conversations("from x?user", regex=True)
+        assert [r.conversation_id for r in results] == ["sess-1"]
+
+    def test_regex_counts_all_matches_but_returns_first_three(self, populated_dbs):
+        search_db = populated_dbs["search_db"]
+        search_db.add_all(
+            SearchPartIndex(
+                id=f"extra-{i}",
+                upstream_session_id="sess-1",
+                message_id="msg-1",
+                role="user",
+                content=f"Hello again {i}",
+                time_created=1_700_000_000_700 + i,
+            )
+            for i in range(4)
+        )
+        search_db.commit()
+
+        results = search_conversations("Hello (from|again)", regex=True)
+
+        sess1 = next(r for r in results if r.conversation_id == "sess-1")
+        assert sess1.total_matches == 5
+        assert [m.part_id for m in sess1.matches] == ["part-1", "extra-0", "extra-1"]
+        assert sess1.matches[1].snippet.startswith("<<MATCH>>Hello again<<END>>")
+
+    def test_regex_limit_counts_conversations(self, populated_dbs):
+        results = search_conversations("Hello", regex=True, limit=1)
+        assert [r.conversation_id for r in results] == ["sess-2"]
+
     def test_regex_directory_filter(self, populated_dbs):
         results = search_conversations("Hello", directory="/proj/b", regex=True)
         ids = [r.conversation_id for r in results]
@@ -316,3 +548,14 @@ class TestListDirectories:
     def test_no_search_data_returns_empty(self, main_db, search_db, patched_config):
         dirs = list_directories()
         assert dirs == []
+
+    def test_result_is_cached_until_invalidated(self, populated_dbs):
+        assert "/proj/a" in list_directories()
+
+        search_db = populated_dbs["search_db"]
+        search_db.get(SearchConversationIndex, "sess-1").directory = "/proj/moved"
+        search_db.commit()
+        assert "/proj/moved" not in list_directories()
+
+        invalidate_directories_cache()
+        assert "/proj/moved" in list_directories()
@@ -5,15 +5,14 @@ search index.
 
 import time
 
-from sqlalchemy import select
+from sqlalchemy import select, text
 
 from app.db_search import (
     SearchConversationIndex,
     SearchPartIndex,
-    get_search_session,
+    get_search_reader_session,
 )
 from app.sync import (
-    extract_text_from_part,
     get_last_sync_time,
     rebuild_search_index,
     set_last_sync_time,
@@ -28,26 +27,6 @@ from tests.conftest import (
 )
 
 
-# ---------------------------------------------------------------------------
-# extract_text_from_part (pure function)
-# ---------------------------------------------------------------------------
-
-
-class TestExtractTextFromPart:
-    def test_text_part_returns_text(self):
-        part = make_upstream_part(part_type="text", text="hello world")
-        assert extract_text_from_part(part) == "hello world"
-
-    def test_non_text_part_returns_none(self):
-        for part_type in ("tool-call", "tool-result", "image", "file"):
-            part = make_upstream_part(part_type=part_type, text="irrelevant")
-            assert extract_text_from_part(part) is None
-
-    def test_text_part_with_none_text_returns_none(self):
-        part = make_upstream_part(part_type="text", text=None)
-        assert extract_text_from_part(part) is None
-
-
 # ---------------------------------------------------------------------------
 # get_last_sync_time / set_last_sync_time
 # ---------------------------------------------------------------------------
@@ -119,10 +98,25 @@ class TestSyncConversation:
     def test_skips_non_text_parts(self, upstream_db, main_db, search_db):
         sess = make_upstream_session(id="s3")
         msg = make_upstream_message(id="m3", session_id="s3", role="assistant")
-        tool_part = make_upstream_part(
-            id="p-tool", message_id="m3", part_type="tool-call", text=None
-        )
-        upstream_db.add_all([sess, msg, tool_part])
+        parts = [
+            make_upstream_part(
+                id=f"p-{part_type}", message_id="m3", part_type=part_type, text="skip"
+            )
+            for part_type in ("tool-call", "tool-result", "image", "file")
+        ]
+        upstream_db.add_all([sess, msg, *parts])
+        upstream_db.commit()
+
+        count = sync_conversation(upstream_db, search_db, sess)
+        search_db.commit()
+
+        assert count == 0
+
+    def test_skips_text_parts_without_text(self, upstream_db, main_db, search_db):
+        sess = make_upstream_session(id="s3b")
+        msg = make_upstream_message(id="m3b", session_id="s3b", role="user")
+        part = make_upstream_part(id="p3b", message_id="m3b", part_type="text", text=None)
+        upstream_db.add_all([sess, msg, part])
         upstream_db.commit()
 
         count = sync_conversation(upstream_db, search_db, sess)
@@ -170,21 +164,19 @@ class TestSyncConversation:
         assert len(pi_rows) == 1
         assert pi_rows[0].content == "new text"
 
-    def test_creates_conversation_row_in_main_db(
-        self, upstream_db, main_db, search_db, patched_config
-    ):
-        sess = make_upstream_session(id="s6")
-        upstream_db.add(sess)
+    def test_skips_malformed_json_parts(self, upstream_db, main_db, search_db):
+        sess = make_upstream_session(id="s5b")
+        msg = make_upstream_message(id="m5b", session_id="s5b", role="user")
+        good = make_upstream_part(id="p5b-good", message_id="m5b", text="fine")
+        bad = make_upstream_part(id="p5b-bad", message_id="m5b")
+        bad.data = "{not json"
+        upstream_db.add_all([sess, msg, good, bad])
         upstream_db.commit()
 
-        sync_conversation(upstream_db, search_db, sess)
+        count = sync_conversation(upstream_db, search_db, sess)
         search_db.commit()
 
-        from app.db import get_conversation
-
-        row = get_conversation("s6")
-        assert row is not None
-        assert row.upstream_session_id == "s6"
+        assert count == 1
 
 
 # ---------------------------------------------------------------------------
@@ -205,7 +197,7 @@ class TestSyncSearchIndex:
 
         sync_search_index()
 
-        with get_search_session() as db:
+        with get_search_reader_session() as db:
             ci = db.get(SearchConversationIndex, "full-1")
             assert ci is not None
             pi_rows = db.scalars(
@@ -215,6 +207,39 @@ class TestSyncSearchIndex:
             ).all()
             assert len(pi_rows) == 1
 
+    def test_full_sync_rebuilds_fts_and_restores_triggers(
+        self, upstream_db, main_db, search_db, patched_config
+    ):
+        sess = make_upstream_session(id="full-2")
+        msg = make_upstream_message(id="fm-2", session_id="full-2", role="user")
+        part = make_upstream_part(id="fp-2", message_id="fm-2", text="quokka sighting")
+        upstream_db.add_all([sess, msg, part])
+        upstream_db.commit()
+
+        sync_search_index(force_full=True)
+
+        with get_search_reader_session() as db:
+            matches = db.execute(
+                text("SELECT rowid FROM part_fts WHERE part_fts MATCH 'quokka'")
+            ).fetchall()
+            triggers = db.scalars(
+                text("SELECT name FROM sqlite_master WHERE type='trigger'")
+            ).all()
+        assert len(matches) == 1
+        assert set(triggers) == {"part_index_ai", "part_index_ad", "part_index_au"}
+
+    def test_full_sync_analyzes_tables(
+        self, upstream_db, main_db, search_db, patched_config
+    ):
+        upstream_db.add(make_upstream_session(id="full-3"))
+        upstream_db.commit()
+
+        sync_search_index(force_full=True)
+
+        with get_search_reader_session() as db:
+            stats = db.scalars(text("SELECT DISTINCT tbl FROM sqlite_stat1")).all()
+        assert "conversation_index" in stats
+
     def test_incremental_sync_only_picks_up_new_conversations(
         self, upstream_db, main_db, search_db, patched_config
     ):
@@ -244,14 +269,90 @@ class TestSyncSearchIndex:
         # Second (incremental) sync — should pick up sess_new
         sync_search_index()
 
-        with get_search_session() as db:
+        with get_search_reader_session() as db:
             ci_new = db.get(SearchConversationIndex, "inc-new")
             assert ci_new is not None
 
+    def test_creates_conversation_rows_in_main_db(
+        self, upstream_db, main_db, search_db, patched_config
+    ):
+        upstream_db.add_all(
+            [make_upstream_session(id="s6"), make_upstream_session(id="s7")]
+        )
+        upstream_db.commit()
+
+        sync_search_index()
+
+        from app.db import get_conversation
+
+        for id_ in ("s6", "s7"):
+            row = get_conversation(id_)
+            assert row is not None
+            assert row.upstream_session_id == id_
+
     def test_no_sessions_is_a_noop(self, upstream_db, main_db, search_db, patched_config):
         """sync_search_index with an empty upstream DB must not raise."""
         sync_search_index()  # No sessions to sync — should return cleanly
 
+    def test_mirrors_archived_state_from_main_db(
+        self, upstream_db, main_db, search_db, patched_config
+    ):
+        from app.db import Conversation
+
+        upstream_db.add_all(
+            [make_upstream_session(id="s8"), make_upstream_session(id="s9")]
+        )
+        upstream_db.commit()
+        main_db.add(Conversation(upstream_session_id="s8", archived=True))
+        main_db.commit()
+
+        sync_search_index()
+
+        with get_search_reader_session() as db:
+            assert db.get(SearchConversationIndex, "s8").archived is True
+            assert db.get(SearchConversationIndex, "s9").archived is False
+
+    def test_reconciles_archived_state_when_up_to_date(
+        self, upstream_db, main_db, search_db, patched_config
+    ):
+        from app.db import Conversation
+
+        upstream_db.add(make_upstream_session(id="s10"))
+        upstream_db.commit()
+        sync_search_index()
+
+        # Change db.py directly, bypassing the mirror-on-write helper
+        main_db.get(Conversation, "s10").archived = True
+        main_db.commit()
+
+        sync_search_index()  # Nothing new upstream
+
+        with get_search_reader_session() as db:
+            assert db.get(SearchConversationIndex, "s10").archived is True
+
+    def test_archive_during_sync_is_reconciled_afterwards(
+        self, upstream_db, main_db, search_db, patched_config, monkeypatch
+    ):
+        import app.sync as sync_module
+
+        from app.db import set_conversation_archived
+
+        upstream_db.add(make_upstream_session(id="s11"))
+        upstream_db.commit()
+        refresh_planner_stats = sync_module.refresh_planner_stats
+
+        def archive_mid_sync(conn, full=False):
+            # Runs after the sync copied archived state, with the writer held
+            set_conversation_archived("s11", archived=True)
+            refresh_planner_stats(conn, full=full)
+
+        monkeypatch.setattr(sync_module, "refresh_planner_stats", archive_mid_sync)
+
+        sync_search_index()
+
+        with get_search_reader_session() as db:
+            assert db.get(SearchConversationIndex, "s11").archived is True
+
 
 # ---------------------------------------------------------------------------
 # rebuild_search_index
@@ -274,7 +375,7 @@ class TestRebuildSearchIndex:
         # Rebuild should delete the search DB file and re-sync from scratch
         rebuild_search_index()
 
-        with get_search_session() as db:
+        with get_search_reader_session() as db:
             ci = db.get(SearchConversationIndex, "rb-1")
             assert ci is not None
             pi_rows = db.scalars(